@@ -1,6 +1,9 @@
 from sklearn.metrics import normalized_mutual_info_score, adjusted_rand_score
-from cdlib.evaluation import newman_girvan_modularity, modularity_overlap, conductance, erdos_renyi_modularity
+from cdlib.evaluation import newman_girvan_modularity, conductance, erdos_renyi_modularity
 
+import numpy as np
+import pandas as pd
+from scipy import sparse
 import networkx as nx
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -16,7 +19,7 @@ def evaluate_internal(G, community):
         erdos_renyi_mod = erdos_renyi_modularity(G, community).score
         print(f"Erdos-Renyi Modularity: {erdos_renyi_mod:.4f}")
     else:
-        overlapping_mod = modularity_overlap(G, community).score
+        overlapping_mod = overlapping_modularity(G, community.communities)
         print(f"Overlapping Modularity: {overlapping_mod:.4f}")
         
 
@@ -43,66 +46,125 @@ def evaluate_internal(G, community):
         'num_nodes_in_communities': num_nodes_in_communities
         }
 
-def evaluate_external(community, mapping, df, label_columns):
+PRIMARY_MEMBERSHIP_POLICIES = ("last", "first", "largest")
+
+def primary_memberships(communities, policy="last"):
+    """
+    Maps every clustered node to a single community index, for external metrics that need a
+    partition. A node in several communities keeps the last or first listed one, or the largest
+    one (ties to the later listed).
+    Returns a dict node -> community index.
+    """
+    if policy not in PRIMARY_MEMBERSHIP_POLICIES:
+        raise ValueError(f"policy must be one of {PRIMARY_MEMBERSHIP_POLICIES}, got {policy} instead.")
+    order = range(len(communities))
+    if policy == "first":
+        order = reversed(order)
+    elif policy == "largest":
+        order = sorted(order, key=lambda idx: len(communities[idx]))
+    # Later writes win, so communities are visited in increasing priority
+    primary = {}
+    for idx in order:
+        for node in communities[idx]:
+            primary[node] = idx
+    return primary
+
+def evaluate_external(community, mapping, df, label_columns, primary_membership="last"):
+    """
+    NMI and ARI of the clustering against every label column of the patient table df.
+    Patients are matched to nodes through mapping (node -> original label, "Patient_<patientId>");
+    patients in no community get community -1, and rows with a missing label are left out of that
+    column's scores. Overlapping nodes are resolved with primary_memberships(primary_membership).
+    """
     results = {}
 
-    df_patients = df.copy(deep=True)
+    primary = primary_memberships(community.communities, primary_membership)
+    node_labels = [mapping.get(node, node) if mapping else node for node in primary]
+    patient_community = pd.Series(list(primary.values()), index=pd.Index(node_labels).astype(str))
+    patient_community = patient_community[patient_community.index.str.startswith('Patient_')]
+    patient_community = patient_community[~patient_community.index.duplicated(keep="last")]
 
-    df_patients['community'] = -1
-    df_patients['patientId'] = 'Patient_' + df_patients['patientId'].astype(str)
-    for i, com in enumerate(community.communities):
-        for node in com:
-            if mapping[node].startswith('Patient_'):
-                df_patients.loc[df_patients['patientId'] == mapping[node], 'community'] = i
+    patient_keys = 'Patient_' + df['patientId'].astype(str)
+    cluster_labels = patient_keys.map(patient_community).fillna(-1).astype(int).to_numpy()
 
     for label_col in label_columns:
-        true_labels = df_patients[label_col].tolist()
-        cluster_labels = df_patients['community'].tolist()
-        try:
-            nmi = normalized_mutual_info_score(true_labels, cluster_labels)
-            ari = adjusted_rand_score(true_labels, cluster_labels)
-            results[f'{label_col}_NMI'] = nmi
-            results[f'{label_col}_ARI'] = ari
-        except:
+        known = df[label_col].notna().to_numpy()
+        if not known.any():
             results[f'{label_col}_NMI'] = None
             results[f'{label_col}_ARI'] = None
+            continue
+        true_labels = df[label_col].to_numpy()[known]
+        results[f'{label_col}_NMI'] = normalized_mutual_info_score(true_labels, cluster_labels[known])
+        results[f'{label_col}_ARI'] = adjusted_rand_score(true_labels, cluster_labels[known])
     return results
 
+def membership_matrix(nodes, communities):
+    """
+    Boolean node x community CSR matrix of a (possibly overlapping) clustering, rows in the order of
+    nodes. Community members that are not in nodes are ignored.
+    """
+    node_index = {node: idx for idx, node in enumerate(nodes)}
+    rows, cols = [], []
+    for idx, comm in enumerate(communities):
+        members = [node_index[node] for node in set(comm) if node in node_index]
+        rows.extend(members)
+        cols.extend([idx] * len(members))
+    return sparse.csr_matrix((np.ones(len(rows), dtype=bool), (rows, cols)), shape=(len(nodes), len(communities)))
+
+
+def belonging_weights(membership):
+    """
+    1 / (number of communities of the node) per node, 0 for nodes in no community.
+    """
+    num_memberships = np.asarray(membership.sum(axis=1)).ravel()
+    with np.errstate(divide="ignore"):
+        return np.where(num_memberships > 0, 1.0 / num_memberships, 0.0)
+
 
+def overlapping_modularity(G, communities):
+    """
+    Sparse version of cdlib's modularity_overlap (Lazar et al.), unweighted, at O(m + sum |C|) cost.
+    For each community: the mean over its members of (inward - outward edges) / (degree * number of
+    memberships), times the fraction of member pairs that are linked; averaged over communities.
+    communities: list of lists of node ids (overlapping allowed)
+    """
+    if len(communities) == 0:
+        return 0.0
+    nodes = list(G.nodes())
+    adjacency = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=None, format="csr")
+    membership = membership_matrix(nodes, communities).astype(np.float64)
+    alpha = belonging_weights(membership)
+    degrees = np.diff(adjacency.indptr).astype(np.float64)
+    inward = (adjacency @ membership).multiply(membership)
+
+    # (in - out) / (degree * memberships) = (2 in - degree) * alpha / degree, for members with degree > 0
+    with np.errstate(divide="ignore"):
+        inv_degrees = np.where(degrees > 0, 1.0 / degrees, 0.0)
+    strength = np.asarray(inward.T @ (2 * alpha * inv_degrees)).ravel() - membership.T @ (alpha * (degrees > 0))
+    sizes = np.asarray(membership.sum(axis=0)).ravel()
+    num_inward = np.asarray(inward.sum(axis=0)).ravel()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = np.where(sizes > 1, (strength / sizes) * (num_inward / (sizes * (sizes - 1))), 0.0)
+    return float(scores.sum() / len(communities))
+
+
+def belonging_modularity(G, communities):
     """
     Compute overlapping modularity for a list of communities.
-    Each node's contribution to a community is 1/(number of communities it belongs to).
+    Each node's contribution to a community is 1/(number of communities it belongs to):
+    Q = 1/2m * sum_c sum_{i,j in c} (A_ij - k_i k_j / 2m) * alpha_ic * alpha_jc,
+    evaluated as sparse products with the adjacency and the degree vector instead of a pair loop.
     communities: list of lists of node ids (overlapping allowed)
     """
     m = G.number_of_edges()
     if m == 0:
         return 0.0
-
-    # 1. Build node -> set of communities mapping
-    node_to_comms = {}
-    for idx, comm in enumerate(communities):
-        for node in comm:
-            node_to_comms.setdefault(node, set()).add(idx)
-    print("Node to communities mapping done.")
-
-    # 2. Precompute alpha for each node in each community
-    node_alpha = {}
-    for node, comms in node_to_comms.items():
-        for comm in comms:
-            node_alpha[(node, comm)] = 1.0 / len(comms)
-    print("Node alpha values computed.")
-
-    Q = 0.0
-    for idx, comm in enumerate(communities):
-        comm_set = set(comm)
-        for i in comm_set:
-            for j in comm_set:
-                A_ij = 1 if G.has_edge(i, j) else 0
-                k_i = G.degree(i)
-                k_j = G.degree(j)
-                alpha_i = node_alpha.get((i, idx), 0)
-                alpha_j = node_alpha.get((j, idx), 0)
-                Q += (A_ij - (k_i * k_j) / (2 * m)) * alpha_i * alpha_j
-
-    Q = Q / (2 * m)
-    return Q
\ No newline at end of file
+    nodes = list(G.nodes())
+    adjacency = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=None, format="csr")
+    degrees = np.array([G.degree(node) for node in nodes], dtype=np.float64)
+    membership = membership_matrix(nodes, communities)
+    belonging = sparse.diags(belonging_weights(membership)) @ membership.astype(np.float64)
+
+    edge_term = (adjacency @ belonging).multiply(belonging).sum()
+    null_term = np.sum((belonging.T @ degrees) ** 2) / (2 * m)
+    return float((edge_term - null_term) / (2 * m))
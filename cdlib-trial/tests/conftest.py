@@ -0,0 +1,5 @@
+import os
+import sys
+
+# community_detection is imported from src/, as when main.py is run from there
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src"))
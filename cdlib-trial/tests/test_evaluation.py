@@ -0,0 +1,21 @@
+import networkx as nx
+import pytest
+from cdlib import NodeClustering
+from cdlib.evaluation import modularity_overlap
+from community_detection.evaluation import overlapping_modularity
+
+
+def test_overlapping_modularity_matches_cdlib():
+    G = nx.karate_club_graph()
+    G.add_edge(5, 5)
+    G.add_node(100)
+    # Overlapping cover with a singleton community and an uncovered node
+    communities = [
+        [0, 1, 2, 3, 7, 11, 12, 13, 17, 19, 21],
+        [2, 8, 9, 13, 14, 15, 18, 20, 22, 23, 26, 27, 29, 30, 31, 32, 33],
+        [4, 5, 6, 10, 16, 0],
+        [24, 25, 28, 31],
+        [100],
+    ]
+    clustering = NodeClustering(communities, G, overlap=True)
+    assert overlapping_modularity(G, communities) == pytest.approx(modularity_overlap(G, clustering).score, abs=1e-12)
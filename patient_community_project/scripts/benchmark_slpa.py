@@ -0,0 +1,56 @@
+import os
+import time
+import pandas as pd
+from cdlib import evaluation
+from cdlib import NodeClustering
+from utils.w_slpa import SLPA_MODES, weighted_slpa_csr, normalize_edge_weights
+from utils.graph_io import load_csr_graph, csr_to_networkx
+
+# Compares runtime and community quality of the SLPA update modes on one graph
+
+# Paths
+GRAPH_NAME = "full"
+DATA_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
+)
+output_dir = os.path.join(DATA_PATH, "w_slpa")
+
+# Benchmark settings
+SEEDS = [42, 101, 202, 303, 404]
+ITERATIONS = 20
+THRESHOLD_R = 0.1
+
+os.makedirs(output_dir, exist_ok=True)
+
+# Load graph and normalize edge weights to [0, 1]
+adjacency, node_ids = load_csr_graph(DATA_PATH)
+adjacency = normalize_edge_weights(adjacency)
+# NetworkX copy only for the cdlib quality scores
+G = csr_to_networkx(adjacency, node_ids)
+
+results = []
+for mode in SLPA_MODES:
+    for seed in SEEDS:
+        start = time.perf_counter()
+        communities = weighted_slpa_csr(adjacency, node_ids, t=ITERATIONS, r=THRESHOLD_R, seed=seed, mode=mode)
+        runtime = time.perf_counter() - start
+
+        clustering = NodeClustering(communities=communities, graph=G, method_name=f"weighted_slpa_{mode}", overlap=True)
+        results.append({
+            "mode": mode,
+            "seed": seed,
+            "runtime_s": runtime,
+            "num_communities": len(communities),
+            "modularity": evaluation.newman_girvan_modularity(G, clustering).score,
+            "overlapping_modularity": evaluation.modularity_overlap(G, clustering).score,
+            "conductance": evaluation.conductance(G, clustering).score,
+        })
+        print(f"{mode:>9} seed={seed}: {runtime:.3f}s, {len(communities)} communities")
+
+results_df = pd.DataFrame(results)
+results_df.to_csv(os.path.join(output_dir, "mode_benchmark.csv"), index=False)
+
+summary_df = results_df.drop(columns="seed").groupby("mode", sort=False).agg(["mean", "std"])
+print("\nWeighted SLPA mode benchmark (mean, std over seeds):")
+print(summary_df.to_string(float_format=lambda x: f"{x:.4f}"))
+print(f"Results saved to {os.path.join(output_dir, 'mode_benchmark.csv')}")
@@ -2,24 +2,47 @@ import os
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics.pairwise import cosine_similarity, euclidean_distances
 from sklearn.preprocessing import Binarizer
 from sklearn.metrics import jaccard_score
 import networkx as nx
+from utils.graph_construction import prepare_response_features, edges_to_networkx, graph_summary
+from utils.graph_io import GML_FILENAME
+from utils.graph_cache import graph_cache_key, file_digest, cached_graph_dir, load_cached_edges, store_cached_edges, publish_cached_graph
+from utils.incremental import save_feature_scaler
+from utils.similarity import similarity_edges, max_pairwise_distance
+from utils.knn_graph import knn_edges
+from utils.sparse_features import mixed_feature_edges
 
 THRESHOLD = 0.8  # similarity threshold to create edges
 # Choose similarity function
 SIMILARITY_TYPE = "cosine"
 # SIMILARITY_TYPE = "euclidean"
+# SIMILARITY_TYPE = "jaccard"  # mixed features only
+# SIMILARITY_TYPE = "gower"  # mixed features only
+# Choose feature set: "response" (dense numeric features) or "mixed" (adds sparse categorical and mutation features)
+FEATURE_MODE = "response"
+CATEGORICAL_FEATURES = ['IGHV_MUTATION_STATUS', 'CLL_EPITYPE', 'TREATMENT_AFTER_SAMPLING']
+USE_MUTATIONS = True  # mixed features only
+MEMORY_BUDGET_MB = 256  # memory available to each similarity tile
+# Choose edge construction: all-pairs "threshold", or "knn", "mutual_knn", "threshold_knn"
+GRAPH_MODE = "threshold"
+K_NEIGHBOURS = 10  # neighbours per patient in the kNN modes
+EXPORT_GML = False  # also write graph.gml next to the binary graph
 
 # Configuration
 GRAPH_NAME = "full"
 PATIENT_DF_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), "../../data/thesis/cll_broad_2022_clinical_data_thesis.csv")
 )
+MUTATION_DF_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../data/thesis/cll_broad_2022_mutations_thesis.csv")
+)
 DATA_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
 )
+CACHE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../data/cache")
+)
 
 os.makedirs(DATA_PATH, exist_ok=True)
 patient_df = pd.read_csv(PATIENT_DF_PATH)
@@ -31,62 +54,67 @@ features = [
     'OS_MONTHS', 
     'OS_STATUS'
 ]
-response_df = patient_df[['patientId'] + features].dropna()
-
-# Convert categorical features to numerical
-response_df['FFS_STATUS'] = response_df['FFS_STATUS'].map(lambda x: int(x[0]))
-response_df['OS_STATUS'] = response_df['OS_STATUS'].map(lambda x: int(x[0]))
+# Drop incomplete rows and convert categorical features to numerical
+response_df = prepare_response_features(patient_df, features)
 
+# Reuse the cached graph if the CSV content and build parameters are unchanged
+build_params = {
+    "features": features,
+    "similarity_type": SIMILARITY_TYPE,
+    "threshold": THRESHOLD,
+    "graph_mode": GRAPH_MODE,
+    "k_neighbours": K_NEIGHBOURS,
+    "feature_mode": FEATURE_MODE,
+}
+if FEATURE_MODE == "mixed":
+    build_params["categorical_features"] = CATEGORICAL_FEATURES
+    build_params["mutations"] = file_digest(MUTATION_DF_PATH) if USE_MUTATIONS else None
+cache_key = graph_cache_key(PATIENT_DF_PATH, **build_params)
+edges = load_cached_edges(CACHE_PATH, cache_key)
 
-# Normalize numerical features
-scaler = StandardScaler()
-X = scaler.fit_transform(response_df[features])
+if edges is not None:
+    print(f"✅ Inputs unchanged, reusing cached graph {cache_key[:12]}")
+elif FEATURE_MODE == "mixed":
+    if GRAPH_MODE != "threshold":
+        raise ValueError("Mixed features only support the threshold graph mode")
+    # Categorical and mutation features stay sparse; similarity uses sparse products
+    mutation_df = pd.read_csv(MUTATION_DF_PATH) if USE_MUTATIONS else None
+    edges = mixed_feature_edges(
+        response_df, patient_df, features, CATEGORICAL_FEATURES, mutation_df,
+        SIMILARITY_TYPE, THRESHOLD, memory_budget_mb=MEMORY_BUDGET_MB,
+    )
+    store_cached_edges(CACHE_PATH, cache_key, edges, build_params)
+else:
+    # Normalize numerical features
+    scaler = StandardScaler()
+    X = scaler.fit_transform(response_df[features])
+    max_dist = max_pairwise_distance(X, MEMORY_BUDGET_MB) if SIMILARITY_TYPE == "euclidean" else None
 
-def compute_similarity(X, similarity_type):
-    if similarity_type == "cosine":
-        # Cosine similarity ranges from -1 (opposite) to 1 (identical).
-        # To normalize to [0,1]: sim_norm = (sim + 1) / 2
-        sim = cosine_similarity(X)
-        sim_norm = (sim + 1) / 2
-        return sim_norm
-    elif similarity_type == "euclidean":
-        # Euclidean distance: lower means more similar. We want higher = more similar.
-        # Invert and normalize: sim = 1 - (dist / max_dist), so that 0 distance -> 1, max distance -> 0
-        dist = euclidean_distances(X)
-        max_dist = dist.max()
-        sim = 1 - dist / max_dist if max_dist > 0 else 1 - dist
-        return sim
+    if GRAPH_MODE == "threshold":
+        # Compute similarity tile by tile and keep only edges above the threshold
+        edges = similarity_edges(X, SIMILARITY_TYPE, THRESHOLD, memory_budget_mb=MEMORY_BUDGET_MB, max_dist=max_dist)
     else:
-        raise ValueError(f"Unknown similarity type: {similarity_type}")
+        # Connect each patient to its nearest neighbours from a ball tree
+        edges = knn_edges(X, SIMILARITY_TYPE, K_NEIGHBOURS, mode=GRAPH_MODE, threshold=THRESHOLD, max_dist=max_dist)
+    store_cached_edges(CACHE_PATH, cache_key, edges, build_params)
+    # Keep the scaler so update_graph.py can add new patients without a full rebuild
+    save_feature_scaler(cached_graph_dir(CACHE_PATH, cache_key), scaler, max_dist)
 
-# Compute similarity matrix
-similarity_matrix = compute_similarity(X, SIMILARITY_TYPE)
-
-# Create graph
-G = nx.Graph()
-node_mapping = {}
-for idx, patient_id in enumerate(response_df['patientId']):
-    G.add_node(idx, patientId=patient_id)
-    node_mapping[patient_id] = idx
-
-# Add edges based on similarity threshold
-for i in range(len(similarity_matrix)):
-    for j in range(i + 1, len(similarity_matrix)):
-        sim = similarity_matrix[i, j]
-        if sim >= THRESHOLD:
-            G.add_edge(i, j, weight=sim)
+node_mapping = {patient_id: idx for idx, patient_id in enumerate(response_df['patientId'])}
 
 # Save graph
-nx.write_gml(G, os.path.join(DATA_PATH, "graph.gml"))
+publish_cached_graph(CACHE_PATH, cache_key, DATA_PATH)
+if EXPORT_GML:
+    nx.write_gml(edges_to_networkx(edges, response_df['patientId']), os.path.join(DATA_PATH, GML_FILENAME))
 
 # Save mapping
 mapping_df = pd.DataFrame(list(node_mapping.items()), columns=["patientId", "nodeId"])
 mapping_df.to_csv(os.path.join(DATA_PATH, "patient_id_mapping.csv"), index=False)
 
 # Print graph summary
+summary = graph_summary(edges)
 print(f"Graph Summary:")
-print(f"Number of nodes: {G.number_of_nodes()}")
-print(f"Number of edges: {G.number_of_edges()}")
-print(f"Average degree: {np.mean([d for n, d in G.degree()]):.2f}")
-print(f"Density: {nx.density(G):.4f}")
-
+print(f"Number of nodes: {summary['num_nodes']}")
+print(f"Number of edges: {summary['num_edges']}")
+print(f"Average degree: {summary['avg_degree']:.2f}")
+print(f"Density: {summary['density']:.4f}")
@@ -1,28 +1,25 @@
-
-
-import networkx as nx
-import random
 import os
+from utils.graph_io import load_csr_graph, save_csr_graph
+from utils.perturbation import base_edge_arrays, generate_replicas, replica_csr
 
-# Load original graph
+# Writes one edge-removal replica to disk for inspection.
+# run_perturbation.py generates its replicas in memory and does not need this file.
 GRAPH_NAME = "full"
 DATA_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
 )
-graph_path = os.path.join(DATA_PATH, "graph.gml")
-G = nx.read_gml(graph_path, label='id')
+REMOVAL_RATE = 0.1  # Remove 10% of edges
+SEED = 42  # Set seed for reproducibility
 
-# Set seed for reproducibility
-random.seed(42)
+# Load original graph
+adjacency, node_ids = load_csr_graph(DATA_PATH)
+base = base_edge_arrays(adjacency)
 
-# Remove 10% of edges
-edges = list(G.edges())
-num_edges_to_remove = int(0.1 * len(edges))
-edges_to_remove = random.sample(edges, num_edges_to_remove)
-G.remove_edges_from(edges_to_remove)
+replica = next(generate_replicas(base, len(node_ids), ["edge"], [REMOVAL_RATE], 1, seed=SEED))
+replica_adjacency, replica_node_ids = replica_csr(base, node_ids, replica)
 
 # Save perturbed graph
-output_path = os.path.join(DATA_PATH, 'edge', "graph.gml")
-os.makedirs(os.path.dirname(output_path), exist_ok=True)
-nx.write_gml(G, output_path)
+output_path = os.path.join(DATA_PATH, 'edge')
+os.makedirs(output_path, exist_ok=True)
+save_csr_graph(output_path, replica_adjacency, replica_node_ids)
 print(f"Saved: {output_path}")
@@ -3,10 +3,18 @@ import pandas as pd
 import numpy as np
 import networkx as nx
 from sklearn.preprocessing import StandardScaler
-from sklearn.metrics.pairwise import cosine_similarity
+from utils.graph_construction import prepare_response_features, edges_to_networkx
+from utils.graph_io import GML_FILENAME
+from utils.similarity import similarity_edges
+from utils.graph_cache import graph_cache_key, cached_graph_dir, load_cached_edges, store_cached_edges, publish_cached_graph
 
-# Set seed for reproducibility
-np.random.seed(42)
+EXPORT_GML = False  # also write graph.gml next to the binary graph
+
+# Noise settings (part of the cache key, so changing them always rebuilds)
+NOISE_SEED = 42
+NOISE_STD = 3
+NOISE_COLUMNS = ['FFS_MONTHS', 'OS_MONTHS']
+THRESHOLD = 0.8
 
 # === Paths ===
 
@@ -19,59 +27,70 @@ PATIENT_DF_PATH = os.path.abspath(
 DATA_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}/noise")
 )
+CACHE_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../data/cache")
+)
 
-graph_path = os.path.join(DATA_PATH, "graph.gml")
 mapping_path = os.path.join(DATA_PATH, "patient_id_mapping.csv")
 output_csv_path = os.path.join(DATA_PATH, "cll_broad_2022_clinical_data_thesis.csv")
 
 os.makedirs(DATA_PATH, exist_ok=True)
 
+features = ['FFS_MONTHS', 'FFS_STATUS', 'OS_MONTHS', 'OS_STATUS']
+build_params = {
+    "features": features,
+    "similarity_type": "cosine",
+    "threshold": THRESHOLD,
+    "noise_columns": NOISE_COLUMNS,
+    "noise_std": NOISE_STD,
+    "noise_seed": NOISE_SEED,
+}
+cache_key = graph_cache_key(PATIENT_DF_PATH, **build_params)
+cache_dir = cached_graph_dir(CACHE_PATH, cache_key)
+cached_csv_path = os.path.join(cache_dir, os.path.basename(output_csv_path))
+
 # === Step 1: Load and Perturb Dataset ===
-if 'cll_broad_2022_clinical_data_thesis.csv' not in os.listdir(DATA_PATH):
+dataset_cached = os.path.exists(cached_csv_path)
+if not dataset_cached:
+    # Set seed for reproducibility
+    np.random.seed(NOISE_SEED)
     df = pd.read_csv(PATIENT_DF_PATH)
 
-    for col in ['FFS_MONTHS', 'OS_MONTHS']:
+    for col in NOISE_COLUMNS:
         if col in df.columns:
             mask = df[col].notnull()
-            noise = np.random.normal(loc=0, scale=3, size=mask.sum())  # mean=0, std=3
+            noise = np.random.normal(loc=0, scale=NOISE_STD, size=mask.sum())
             df.loc[mask, col] += noise
 
-    df.to_csv(output_csv_path, index=False)
-    print(f"✅ Perturbed dataset saved to: {output_csv_path}")
+    os.makedirs(cache_dir, exist_ok=True)
+    df.to_csv(cached_csv_path, index=False)
 else:
-    print(f"⚠️ Perturbed dataset already exists at: {output_csv_path}")
-    df = pd.read_csv(output_csv_path)
+    print(f"⚠️ Perturbed dataset for these noise settings already exists ({cache_key[:12]})")
+    df = pd.read_csv(cached_csv_path)
 
 # === Step 2: Build Graph ===
-features = ['FFS_MONTHS', 'FFS_STATUS', 'OS_MONTHS', 'OS_STATUS']
-response_df = df[['patientId'] + features].dropna()
-
-response_df['FFS_STATUS'] = response_df['FFS_STATUS'].map(lambda x: int(x[0]))
-response_df['OS_STATUS'] = response_df['OS_STATUS'].map(lambda x: int(x[0]))
-
-scaler = StandardScaler()
-X = scaler.fit_transform(response_df[features])
-
-sim = cosine_similarity(X)
-sim_norm = (sim + 1) / 2
-
-G = nx.Graph()
-node_mapping = {}
-for idx, patient_id in enumerate(response_df['patientId']):
-    G.add_node(idx, patientId=patient_id)
-    node_mapping[patient_id] = idx
-
-THRESHOLD = 0.8
-for i in range(len(sim_norm)):
-    for j in range(i + 1, len(sim_norm)):
-        if sim_norm[i, j] >= THRESHOLD:
-            G.add_edge(i, j, weight=sim_norm[i, j])
+response_df = prepare_response_features(df, features)
+
+edges = load_cached_edges(CACHE_PATH, cache_key)
+if edges is None:
+    scaler = StandardScaler()
+    X = scaler.fit_transform(response_df[features])
+    edges = similarity_edges(X, "cosine", THRESHOLD)
+    store_cached_edges(CACHE_PATH, cache_key, edges, build_params)
+else:
+    print(f"✅ Inputs unchanged, reusing cached graph {cache_key[:12]}")
+node_mapping = {patient_id: idx for idx, patient_id in enumerate(response_df['patientId'])}
 
-nx.write_gml(G, graph_path)
+publish_cached_graph(CACHE_PATH, cache_key, DATA_PATH)
+if EXPORT_GML:
+    nx.write_gml(edges_to_networkx(edges, response_df['patientId']), os.path.join(DATA_PATH, GML_FILENAME))
 mapping_df = pd.DataFrame(list(node_mapping.items()), columns=["patientId", "nodeId"])
 mapping_df.to_csv(mapping_path, index=False)
 
-print(f"✅ Perturbed dataset saved to: {output_csv_path}")
-print(f"✅ Graph saved to: {graph_path}")
+if dataset_cached:
+    print(f"✅ Perturbed dataset reused from cache {cache_key[:12]}, copied to: {output_csv_path}")
+else:
+    print(f"✅ Perturbed dataset saved to: {output_csv_path}")
+print(f"✅ Graph saved to: {DATA_PATH}")
 print(f"✅ Mapping saved to: {mapping_path}")
-print(f"📊 Graph Summary: Nodes={G.number_of_nodes()}, Edges={G.number_of_edges()}")
+print(f"📊 Graph Summary: Nodes={edges.shape[0]}, Edges={edges.nnz}")
@@ -0,0 +1,47 @@
+import os
+import time
+import numpy as np
+from utils.slpa_kernels import NUMBA_AVAILABLE
+from utils.w_slpa import slpa_propagate, normalize_edge_weights
+from utils.graph_io import load_csr_graph
+
+# Checks that seeded SLPA runs give identical results with the NumPy and Numba kernels on the full
+# graph and times both (tests/test_slpa_kernels.py covers the same check on small graphs)
+
+# Paths
+GRAPH_NAME = "full"
+DATA_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
+)
+
+SEEDS = [42, 101, 202]
+ITERATIONS = 20
+
+if not NUMBA_AVAILABLE:
+    raise SystemExit("numba is not installed, only the NumPy backend is available")
+
+adjacency, _ = load_csr_graph(DATA_PATH)
+adjacency = normalize_edge_weights(adjacency)
+indptr, indices, weights = adjacency.indptr, adjacency.indices, adjacency.data
+
+# Compile once so the timings below do not include JIT compilation
+slpa_propagate(indptr, indices, weights, 1, np.random.default_rng(0), backend="numba")
+
+for seed in SEEDS:
+    timings = {}
+    slpa_results = {}
+    for backend in ("numpy", "numba"):
+        start = time.perf_counter()
+        slpa_results[backend] = slpa_propagate(indptr, indices, weights, ITERATIONS, np.random.default_rng(seed), backend=backend)
+        timings[backend] = time.perf_counter() - start
+
+    (memory_np, memory_len_np, _), (memory_nb, memory_len_nb, _) = slpa_results["numpy"], slpa_results["numba"]
+    assert np.array_equal(memory_len_np, memory_len_nb), f"SLPA memory lengths differ for seed {seed}"
+    for node in range(len(memory_len_np)):
+        assert np.array_equal(memory_np[node, :memory_len_np[node]], memory_nb[node, :memory_len_nb[node]]), \
+            f"SLPA memories differ for seed {seed} at node {node}"
+
+    print(f"seed={seed}: identical SLPA memories "
+          f"(numpy {timings['numpy']:.3f}s, numba {timings['numba']:.3f}s)")
+
+print("✅ NumPy and Numba kernels agree")
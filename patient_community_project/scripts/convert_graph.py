@@ -0,0 +1,13 @@
+import os
+from utils.graph_io import convert_gml, GML_FILENAME
+
+# Converts every data/<GRAPH_NAME>/**/graph.gml (full graph and perturbed copies) to the binary CSR format
+GRAPH_NAME = "full"
+DATA_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
+)
+
+for root, dirs, files in os.walk(DATA_PATH):
+    if GML_FILENAME in files:
+        G = convert_gml(root)
+        print(f"✅ Converted {os.path.join(root, GML_FILENAME)} (Nodes={G.number_of_nodes()}, Edges={G.number_of_edges()})")
@@ -0,0 +1,102 @@
+import os
+import numpy as np
+import pandas as pd
+from graspologic.partition import hierarchical_leiden
+from utils.consensus import accumulate_coassociation, coassociation_fraction, consensus_partition, node_stability
+from utils.slpa_ensemble import slpa_ensemble
+from utils.perturbation import base_edge_arrays
+from utils.w_slpa import normalize_edge_weights
+from utils.graph_io import load_graph, networkx_to_csr
+from utils.graph_cache import read_graph_key, write_graph_key
+
+# Runs that vote in the consensus; each run only updates per-edge counts, so any number fits in memory
+SLPA_SEEDS = list(range(100))
+LEIDEN_SEEDS = list(range(1, 21))
+LEIDEN_LEVEL = 0
+# Edges whose endpoints share a community in at least this fraction of runs join the consensus
+CONSENSUS_THRESHOLD = 0.5
+# Seeds handed to the SLPA process pool at a time
+BATCH_SIZE = 20
+NUM_WORKERS = os.cpu_count()
+
+# Paths
+GRAPH_NAME = "full"
+DATA_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
+)
+mapping_path = os.path.join(DATA_PATH, "patient_id_mapping.csv")
+output_dir = os.path.join(DATA_PATH, "consensus")
+
+
+def main():
+    os.makedirs(output_dir, exist_ok=True)
+
+    G = load_graph(DATA_PATH)
+    adjacency, node_ids = networkx_to_csr(G)
+    rows, cols, _, _ = base_edge_arrays(adjacency)
+    agree = np.zeros(len(rows), dtype=np.int64)
+    observed = np.zeros(len(rows), dtype=np.int64)
+
+    # Weighted SLPA runs on edge weights normalized to [0, 1], as in run_w_slpa.py
+    slpa_adjacency = normalize_edge_weights(adjacency)
+    for start in range(0, len(SLPA_SEEDS), BATCH_SIZE):
+        batch = SLPA_SEEDS[start:start + BATCH_SIZE]
+        for _, communities, _ in slpa_ensemble(slpa_adjacency, node_ids, batch, max_workers=NUM_WORKERS):
+            accumulate_coassociation(agree, observed, rows, cols, communities, node_ids)
+        print(f"SLPA runs: {start + len(batch)}/{len(SLPA_SEEDS)}")
+
+    # Leiden runs, as in run_leiden.py
+    for seed in LEIDEN_SEEDS:
+        communities = {}
+        for part in hierarchical_leiden(G, max_cluster_size=100, random_seed=seed):
+            if part.level == LEIDEN_LEVEL:
+                communities.setdefault(part.cluster, []).append(part.node)
+        accumulate_coassociation(agree, observed, rows, cols, list(communities.values()), node_ids)
+    print(f"Leiden runs: {len(LEIDEN_SEEDS)}")
+
+    fraction = coassociation_fraction(agree, observed)
+    labels = consensus_partition(rows, cols, fraction, len(node_ids), CONSENSUS_THRESHOLD)
+    stability = node_stability(rows, cols, fraction, labels)
+
+    # Save co-association counts, consensus assignments and summary
+    np.savez_compressed(
+        os.path.join(output_dir, "coassociation.npz"),
+        node_ids=node_ids, rows=rows, cols=cols, agree=agree, observed=observed,
+    )
+    mapping_df = pd.read_csv(mapping_path)
+    nodeid_to_patientid = dict(zip(mapping_df["nodeId"].astype(int), mapping_df["patientId"]))
+    community_df = pd.DataFrame({
+        "nodeId": node_ids,
+        "patientId": [nodeid_to_patientid.get(int(node)) for node in node_ids],
+        "communityId": labels,
+        "stability": stability,
+    })
+    community_df.to_csv(os.path.join(output_dir, "community_assignments.csv"), index=False)
+    graph_key = read_graph_key(DATA_PATH)
+    if graph_key is not None:
+        write_graph_key(output_dir, graph_key)
+
+    sizes = community_df["communityId"].value_counts()
+    metrics_df = pd.DataFrame([{
+        "num_slpa_runs": len(SLPA_SEEDS),
+        "num_leiden_runs": len(LEIDEN_SEEDS),
+        "consensus_threshold": CONSENSUS_THRESHOLD,
+        "num_communities": len(sizes),
+        "num_singleton_communities": int((sizes == 1).sum()),
+        "max_community_size": int(sizes.max()),
+        "mean_edge_coassociation": fraction.mean() if len(fraction) else 0.0,
+        "mean_node_stability": stability.mean(),
+        "min_node_stability": stability.min(),
+    }])
+    metrics_df.to_csv(os.path.join(output_dir, "metrics.csv"), index=False)
+
+    print("Consensus Clustering Summary:")
+    print(f"Runs: {len(SLPA_SEEDS)} SLPA + {len(LEIDEN_SEEDS)} Leiden")
+    print(f"Number of communities: {len(sizes)} ({int((sizes == 1).sum())} singletons)")
+    print(f"Max community size: {int(sizes.max())}")
+    print(f"Mean node stability: {stability.mean():.4f} (min {stability.min():.4f})")
+    print(f"✅ Consensus saved to: {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
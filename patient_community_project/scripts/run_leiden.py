@@ -1,11 +1,12 @@
 import os
+import numpy as np
 import pandas as pd
 import networkx as nx
 from graspologic.partition import hierarchical_leiden
-from cdlib import evaluation
-from cdlib import NodeClustering
-from sklearn.metrics import normalized_mutual_info_score, adjusted_rand_score
 from collections import defaultdict
+from utils.graph_io import load_graph, networkx_to_csr
+from utils.community_metrics import partition_metrics
+from utils.label_alignment import clinical_label_codes, contingency_table, nmi_ari
 
 # Define paths
 GRAPH_NAME = "full"
@@ -15,15 +16,17 @@ PATIENT_DF_PATH = os.path.abspath(
 DATA_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
 )
-graph_path = os.path.join(DATA_PATH, "graph.gml")
 mapping_path = os.path.join(DATA_PATH, "patient_id_mapping.csv")
 patient_df_path = PATIENT_DF_PATH
 output_dir = os.path.join(DATA_PATH, "leiden")
 
+# Clinical label columns scored with NMI / ARI, keyed by the suffix used in metrics.csv
+LABEL_COLUMNS = {"epitype": "CLL_EPITYPE", "subtype": "TUMOR_MOLECULAR_SUBTYPE"}
+
 os.makedirs(output_dir, exist_ok=True)
 
 # Load graph
-G = nx.read_gml(graph_path, label='id')
+G = load_graph(DATA_PATH)
 
 # Load mapping
 mapping_df = pd.read_csv(mapping_path)
@@ -42,67 +45,60 @@ level_assignments = defaultdict(list)
 for part in partitions:
     level_assignments[part.level].append((part.node, part.cluster))
 
+# Community label of every node at every level (-1 where a level leaves a node out), so that the
+# internal metrics of all levels come from a single scan over the edges
+adjacency, node_ids = networkx_to_csr(G)
+levels = list(level_assignments)
+level_labels = np.full((len(levels), len(node_ids)), -1)
+for row, level in enumerate(levels):
+    nodes, clusters = zip(*level_assignments[level])
+    level_labels[row, np.searchsorted(node_ids, nodes)] = clusters
+level_metrics = dict(zip(levels, partition_metrics(adjacency, level_labels)))
+
+# Clinical labels joined to the graph nodes once and shared by every level; as before, only nodes
+# with all label columns present are scored
+clinical_codes = clinical_label_codes(node_ids, node_to_patient, patient_df, list(LABEL_COLUMNS.values()))
+complete = (clinical_codes >= 0).all(axis=0)
+
 # Store community assignments at each level
 summary = []
-for level, assignments in level_assignments.items():
+for row, (level, assignments) in enumerate(level_assignments.items()):
     comm_df = pd.DataFrame(assignments, columns=["nodeId", "communityId"])
     comm_df["patientId"] = comm_df["nodeId"].map(node_to_patient)
     comm_df.to_csv(os.path.join(output_dir, f"level_{level}_community_assignments.csv"), index=False)
 
-    # Prepare clustering object for cdlib
-    communities = {}
-    for node, comm in assignments:
-        communities.setdefault(comm, []).append(node)
-    clustering = NodeClustering(communities=list(communities.values()), graph=G, method_name="leiden")
-
-    # Compute internal metrics
-    mod = evaluation.newman_girvan_modularity(G, clustering).score
-    cond = evaluation.conductance(G, clustering).score
-
-        # Only use nodes present in comm_df for this level
-    comm_nodes = set(comm_df["nodeId"])
-    graph_nodes = [n for n in G.nodes() if int(n) in comm_nodes]
-
-    # Compute external metrics (only for disjoint)
-    labels_true = patient_df.set_index("patientId").loc[
-        [node_to_patient[int(n)] for n in graph_nodes]
-    ][["CLL_EPITYPE", "TUMOR_MOLECULAR_SUBTYPE"]]
-
-    labels_pred = [comm_df.set_index("nodeId").loc[int(n), "communityId"] for n in graph_nodes]
-    labels_true["communityId"] = labels_pred
-
-    # Drop rows with any NaN in true labels or communityId
-    labels_true = labels_true.dropna(subset=["CLL_EPITYPE", "TUMOR_MOLECULAR_SUBTYPE", "communityId"])
-    filtered_labels_pred = labels_true["communityId"].tolist()
-
-    nmi_epitype = normalized_mutual_info_score(labels_true["CLL_EPITYPE"], filtered_labels_pred)
-    ari_epitype = adjusted_rand_score(labels_true["CLL_EPITYPE"], filtered_labels_pred)
-    nmi_subtype = normalized_mutual_info_score(labels_true["TUMOR_MOLECULAR_SUBTYPE"], filtered_labels_pred)
-    ari_subtype = adjusted_rand_score(labels_true["TUMOR_MOLECULAR_SUBTYPE"], filtered_labels_pred)
-    
-    num_nodes_in_communities = len(set(node for comm in communities.values() for node in comm))
+    # Internal metrics
+    internal = level_metrics[level]
+    mod = internal["modularity"]
+    cond = internal["conductance"]
+    sizes = internal["size"]
+
+    # External metrics (only for disjoint) on the nodes of this level
+    scored = complete & (level_labels[row] >= 0)
+    external = {}
+    for code_row, (name, column) in enumerate(LABEL_COLUMNS.items()):
+        table = contingency_table(clinical_codes[code_row, scored], level_labels[row, scored])
+        external[f"nmi_{name}"], external[f"ari_{name}"] = nmi_ari(table)
+
     # Save metrics
     metrics = {
         "level": level,
-        "num_communities": len(communities),
-        "num_nodes_in_communities": num_nodes_in_communities,
-        "avg_community_size": sum(len(c) for c in communities.values()) / len(communities),
-        "min_community_size": min(len(c) for c in communities.values()),
-        "max_community_size": max(len(c) for c in communities.values()),
+        "num_communities": len(sizes),
+        "num_nodes_in_communities": int(sizes.sum()),
+        "avg_community_size": sizes.mean(),
+        "min_community_size": int(sizes.min()),
+        "max_community_size": int(sizes.max()),
         "modularity": mod,
         "conductance": cond,
-        "nmi_epitype": nmi_epitype,
-        "ari_epitype": ari_epitype,
-        "nmi_subtype": nmi_subtype,
-        "ari_subtype": ari_subtype
+        **external
     }
     summary.append(metrics)
 
-    print(f"Level {level}: {len(communities)} communities")
+    print(f"Level {level}: {len(sizes)} communities")
     print(f"  Avg size: {metrics['avg_community_size']:.2f}, Min: {metrics['min_community_size']}, Max: {metrics['max_community_size']}")
     print(f"  Modularity: {mod:.4f}, Conductance: {cond:.4f}")
-    print(f"  NMI (CLL_EPITYPE): {nmi_epitype:.4f}, ARI: {ari_epitype:.4f}")
-    print(f"  NMI (TUMOR_MOLECULAR_SUBTYPE): {nmi_subtype:.4f}, ARI: {ari_subtype:.4f}")
+    for name, column in LABEL_COLUMNS.items():
+        print(f"  NMI ({column}): {external[f'nmi_{name}']:.4f}, ARI: {external[f'ari_{name}']:.4f}")
 
 # Save summary metrics
 summary_df = pd.DataFrame(summary)
@@ -0,0 +1,79 @@
+import os
+import json
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from sklearn.preprocessing import StandardScaler
+from utils.graph_construction import prepare_response_features
+from utils.graph_cache import graph_cache_key
+from utils.similarity import similarity_edges
+from utils.noise_robustness import init_noise_worker, run_noise_replica
+
+# Noise grid: every noise std is run for NUM_REPLICAS independent draws
+NOISE_STDS = [1, 3, 5]
+NUM_REPLICAS = 5
+NOISE_SEED = 42
+NOISE_COLUMNS = ['FFS_MONTHS', 'OS_MONTHS']
+THRESHOLD = 0.8
+SIMILARITY_TYPE = "cosine"
+NUM_WORKERS = os.cpu_count()
+
+# Configuration
+GRAPH_NAME = "full"
+PATIENT_DF_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../data/thesis/cll_broad_2022_clinical_data_thesis.csv")
+)
+DATA_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
+)
+
+features = ['FFS_MONTHS', 'FFS_STATUS', 'OS_MONTHS', 'OS_STATUS']
+
+
+def main():
+    # Results live in a directory keyed by the CSV content and every noise parameter,
+    # so results for one noise setting can never be mistaken for another
+    noise_params = {
+        "features": features,
+        "similarity_type": SIMILARITY_TYPE,
+        "threshold": THRESHOLD,
+        "noise_columns": NOISE_COLUMNS,
+        "noise_stds": NOISE_STDS,
+        "num_replicas": NUM_REPLICAS,
+        "noise_seed": NOISE_SEED,
+    }
+    run_key = graph_cache_key(PATIENT_DF_PATH, **noise_params)
+    output_dir = os.path.join(DATA_PATH, "noise_robustness", run_key[:12])
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, "params.json"), "w") as f:
+        json.dump({"key": run_key, "params": noise_params}, f, indent=2)
+
+    # Scale the clean cohort once; replicas only recompute the noisy columns
+    response_df = prepare_response_features(pd.read_csv(PATIENT_DF_PATH), features)
+    scaler = StandardScaler()
+    X_base = scaler.fit_transform(response_df[features])
+    noise_idx = [features.index(col) for col in NOISE_COLUMNS]
+    raw_noise_values = response_df[NOISE_COLUMNS].to_numpy(dtype=float)
+    base_edges = similarity_edges(X_base, SIMILARITY_TYPE, THRESHOLD)
+
+    mapping_df = pd.DataFrame({"patientId": response_df['patientId'].values, "nodeId": range(len(response_df))})
+    mapping_df.to_csv(os.path.join(output_dir, "patient_id_mapping.csv"), index=False)
+
+    tasks = [
+        (noise_std, replica, NOISE_SEED, os.path.join(output_dir, f"std_{noise_std}", f"replica_{replica}"))
+        for noise_std in NOISE_STDS
+        for replica in range(NUM_REPLICAS)
+    ]
+    init_args = (X_base, raw_noise_values, scaler.mean_, scaler.scale_, noise_idx, base_edges, SIMILARITY_TYPE, THRESHOLD)
+    with ProcessPoolExecutor(max_workers=NUM_WORKERS, initializer=init_noise_worker, initargs=init_args) as executor:
+        results = list(executor.map(run_noise_replica, *zip(*tasks)))
+
+    metrics_df = pd.DataFrame(results)
+    metrics_df.to_csv(os.path.join(output_dir, "metrics.csv"), index=False)
+
+    print(f"Noise Robustness Summary ({output_dir}):")
+    summary_df = metrics_df.groupby("noise_std")[["num_edges", "num_isolated_nodes", "edge_jaccard_vs_clean"]].agg(["mean", "std"])
+    print(summary_df.to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -3,9 +3,9 @@ import pandas as pd
 import networkx as nx
 from cdlib import algorithms, evaluation
 from build_graph import DATA_PATH, PATIENT_DF_PATH
+from utils.graph_io import load_graph
 
 # Define paths
-graph_path = os.path.join(DATA_PATH, "graph.gml")
 mapping_path = os.path.join(DATA_PATH, "patient_id_mapping.csv")
 patient_df_path = PATIENT_DF_PATH
 output_dir = os.path.join(DATA_PATH, "slpa")
@@ -14,7 +14,7 @@ output_dir = os.path.join(DATA_PATH, "slpa")
 os.makedirs(output_dir, exist_ok=True)
 
 # Load graph
-G = nx.read_gml(graph_path, label='id')
+G = load_graph(DATA_PATH)
 
 # Load mapping
 mapping_df = pd.read_csv(mapping_path)
@@ -5,8 +5,13 @@ import random
 from collections import defaultdict
 from cdlib import evaluation
 from cdlib import NodeClustering
-from utils.w_slpa import weighted_slpa
+from utils.w_slpa import (
+    slpa_label_counts, communities_from_counts, label_frequency_values, plot_label_frequencies,
+    save_label_counts, normalize_edge_weights,
+)
 from utils.overlapping_summary import print_overlapping_node_summary
+from utils.graph_io import load_graph, csr_to_networkx, networkx_to_csr
+from utils.graph_cache import read_graph_key, write_graph_key
 
 # Paths
 GRAPH_NAME = "full"
@@ -16,20 +21,31 @@ PATIENT_DF_PATH = os.path.abspath(
 DATA_PATH = os.path.abspath(
     os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
 )
-graph_path = os.path.join(DATA_PATH, "graph.gml")
 mapping_path = os.path.join(DATA_PATH, "patient_id_mapping.csv")
 patient_df_path = PATIENT_DF_PATH
 output_dir = os.path.join(DATA_PATH, "w_slpa")
 
+# Minimum label frequency for community membership; saved label counts can be re-thresholded
+# at other values with sweep_slpa_r.py
+SLPA_R = 0.1
+# Iteration cap; with SLPA_TOL set, propagation stops early once fewer than that fraction of nodes
+# change their dominant label for SLPA_PATIENCE iterations in a row
+SLPA_MAX_ITERATIONS = 20
+SLPA_TOL = None
+# SLPA_TOL = 0.005
+SLPA_PATIENCE = 3
+
 os.makedirs(output_dir, exist_ok=True)
 
 # Load graph and mapping
-G = nx.read_gml(graph_path, label='id')
+G = load_graph(DATA_PATH)
 mapping_df = pd.read_csv(mapping_path)
 mapping_df['nodeId'] = mapping_df['nodeId'].astype(int)
 nodeid_to_patientid = dict(zip(mapping_df["nodeId"], mapping_df["patientId"]))
 
-if "community_assignments.csv" in os.listdir(output_dir):
+# Only reuse saved communities if they were computed from the current graph
+graph_key = read_graph_key(DATA_PATH)
+if graph_key is not None and read_graph_key(output_dir) == graph_key:
     community_df = pd.read_csv(os.path.join(output_dir, "community_assignments.csv"))
     communities = []
     for community_id in community_df['communityId'].unique():
@@ -37,13 +53,20 @@ if "community_assignments.csv" in os.listdir(output_dir):
         communities.append(members)
 else:
     # Normalize edge weights to [0, 1]
-    weights = [d['weight'] for u, v, d in G.edges(data=True)]
-    min_w, max_w = min(weights), max(weights)
-    for u, v, d in G.edges(data=True):
-        d['weight'] = (d['weight'] - min_w) / (max_w - min_w + 1e-9)
+    adjacency, node_ids = networkx_to_csr(G)
+    adjacency = normalize_edge_weights(adjacency)
+    G = csr_to_networkx(adjacency, node_ids)
 
-    # Run weighted SLPA
-    communities = weighted_slpa(G, freq_dist_path=os.path.join(output_dir, "community_size_distribution.png"), plot_freq_dist=True)
+    # Run weighted SLPA and keep the label memories for later re-thresholding
+    counts, num_iterations = slpa_label_counts(
+        adjacency, t=SLPA_MAX_ITERATIONS, tol=SLPA_TOL, patience=SLPA_PATIENCE
+    )
+    print(f"SLPA propagation stopped after {num_iterations} of at most {SLPA_MAX_ITERATIONS} iterations")
+    save_label_counts(output_dir, counts, node_ids)
+    plot_label_frequencies(
+        label_frequency_values(counts), SLPA_R, os.path.join(output_dir, "community_size_distribution.png")
+    )
+    communities = communities_from_counts(counts, SLPA_R, node_ids)
 
     # Save community assignments
     community_data = []
@@ -56,6 +79,8 @@ else:
             })
     community_df = pd.DataFrame(community_data)
     community_df.to_csv(os.path.join(output_dir, "community_assignments.csv"), index=False)
+    if graph_key is not None:
+        write_graph_key(output_dir, graph_key)
 
 clustering = NodeClustering(communities=communities, graph=G, method_name="weighted_slpa", overlap=True)
 
@@ -0,0 +1,48 @@
+import os
+import numpy as np
+import pandas as pd
+from utils.w_slpa import load_label_counts, communities_from_counts
+from utils.graph_cache import read_graph_key
+
+# Candidate SLPA membership thresholds; all are read off the label memories saved by run_w_slpa.py
+R_VALUES = [0.01, 0.02, 0.05, 0.1, 0.15, 0.2, 0.25, 0.3, 0.35, 0.4, 0.45, 0.5]
+
+# Paths
+GRAPH_NAME = "full"
+DATA_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
+)
+output_dir = os.path.join(DATA_PATH, "w_slpa")
+
+stored = load_label_counts(output_dir)
+if stored is None:
+    raise FileNotFoundError(f"No SLPA label counts in {output_dir}, run run_w_slpa.py first")
+graph_key = read_graph_key(DATA_PATH)
+if graph_key is not None and read_graph_key(output_dir) != graph_key:
+    print(f"⚠️ Label counts in {output_dir} were computed from a different graph, rerun run_w_slpa.py")
+counts, node_ids = stored
+
+summary = []
+for r in R_VALUES:
+    communities = communities_from_counts(counts, r, node_ids)
+    sizes = np.array([len(comm) for comm in communities])
+    memberships = pd.Series(np.concatenate(communities) if communities else []).value_counts()
+    summary.append({
+        "r": r,
+        "num_communities": len(communities),
+        "num_nodes_in_communities": len(memberships),
+        "num_overlapping_nodes": int((memberships > 1).sum()),
+        "avg_community_size": sizes.mean() if len(sizes) else 0.0,
+        "min_community_size": sizes.min() if len(sizes) else 0,
+        "max_community_size": sizes.max() if len(sizes) else 0,
+    })
+summary_df = pd.DataFrame(summary)
+
+summary_path = os.path.join(output_dir, "r_sweep.csv")
+summary_df.to_csv(summary_path, index=False)
+
+print("SLPA r Sweep Summary:")
+for row in summary_df.itertuples():
+    print(f"  r={row.r:.2f}: Communities={row.num_communities}, Nodes={row.num_nodes_in_communities}, "
+          f"Overlapping={row.num_overlapping_nodes}, Avg size={row.avg_community_size:.2f}")
+print(f"✅ Sweep saved to: {summary_path}")
@@ -0,0 +1,40 @@
+import os
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from utils.graph_construction import prepare_response_features
+from utils.similarity import similarity_edges
+from utils.threshold_sweep import threshold_sweep
+
+# Candidate thresholds; all graphs come from a single similarity pass at the lowest one
+THRESHOLDS = [0.6, 0.65, 0.7, 0.75, 0.8, 0.85, 0.9, 0.95]
+SIMILARITY_TYPE = "cosine"
+# SIMILARITY_TYPE = "euclidean"
+MEMORY_BUDGET_MB = 256
+
+# Configuration
+GRAPH_NAME = "full"
+PATIENT_DF_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../data/thesis/cll_broad_2022_clinical_data_thesis.csv")
+)
+DATA_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
+)
+os.makedirs(DATA_PATH, exist_ok=True)
+
+features = ['FFS_MONTHS', 'FFS_STATUS', 'OS_MONTHS', 'OS_STATUS']
+response_df = prepare_response_features(pd.read_csv(PATIENT_DF_PATH), features)
+
+scaler = StandardScaler()
+X = scaler.fit_transform(response_df[features])
+
+edges = similarity_edges(X, SIMILARITY_TYPE, min(THRESHOLDS), memory_budget_mb=MEMORY_BUDGET_MB)
+summary_df, edge_sets = threshold_sweep(edges, THRESHOLDS)
+
+summary_path = os.path.join(DATA_PATH, "threshold_sweep.csv")
+summary_df.to_csv(summary_path, index=False)
+
+print("Threshold Sweep Summary:")
+for row in summary_df.itertuples():
+    print(f"  Threshold {row.threshold:.2f}: Edges={row.num_edges}, Avg degree={row.avg_degree:.2f}, "
+          f"Density={row.density:.4f}, Isolated nodes={row.num_isolated_nodes}")
+print(f"✅ Sweep saved to: {summary_path}")
@@ -0,0 +1,57 @@
+import os
+import pandas as pd
+from utils.graph_construction import prepare_response_features
+from utils.graph_cache import graph_cache_key, read_graph_key, read_graph_params, write_graph_key
+from utils.incremental import load_feature_scaler, new_patient_edges, append_patients
+
+# Adds patients that are in the clinical CSV but not yet in patient_id_mapping.csv to an existing graph.
+# Only similarities between the new patients and the cohort are computed; existing nodeIds are kept.
+GRAPH_NAME = "full"
+PATIENT_DF_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "../../data/thesis/cll_broad_2022_clinical_data_thesis.csv")
+)
+DATA_PATH = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), f"../data/{GRAPH_NAME}")
+)
+mapping_path = os.path.join(DATA_PATH, "patient_id_mapping.csv")
+
+# Use the same settings the graph was built with
+graph_key = read_graph_key(DATA_PATH)
+build_params = read_graph_params(DATA_PATH)
+if build_params is None:
+    raise ValueError(f"No build parameters recorded in {DATA_PATH}, run build_graph.py first")
+if build_params.get("feature_mode", "response") != "response":
+    raise ValueError("Incremental updates only support the response features, rerun build_graph.py instead")
+if build_params.get("graph_mode", "threshold") != "threshold":
+    raise ValueError("Incremental updates only support the threshold graph mode, rerun build_graph.py instead")
+features = build_params["features"]
+similarity_type = build_params["similarity_type"]
+threshold = build_params["threshold"]
+
+mapping_df = pd.read_csv(mapping_path).sort_values("nodeId")
+response_df = prepare_response_features(pd.read_csv(PATIENT_DF_PATH), features)
+
+is_new = ~response_df['patientId'].isin(mapping_df['patientId'])
+new_df = response_df[is_new].drop_duplicates('patientId')
+if new_df.empty:
+    print("No new patients, graph is up to date.")
+else:
+    existing_df = response_df[~is_new].drop_duplicates('patientId').set_index('patientId')
+    missing = set(mapping_df['patientId']) - set(existing_df.index)
+    if missing:
+        raise ValueError(f"{len(missing)} patients in the graph are missing from the CSV, rebuild with build_graph.py")
+    existing_df = existing_df.loc[mapping_df['patientId']]
+
+    # Scale with the statistics of the original build so existing edge weights stay comparable
+    mean, scale, max_dist = load_feature_scaler(DATA_PATH)
+    X_existing = (existing_df[features].to_numpy(dtype=float) - mean) / scale
+    X_new = (new_df[features].to_numpy(dtype=float) - mean) / scale
+
+    new_edges = new_patient_edges(X_existing, X_new, similarity_type, threshold, max_dist=max_dist)
+    new_mapping_df = append_patients(DATA_PATH, new_edges, new_df['patientId'])
+
+    # The graph no longer matches any cached build, give it its own key so old results are not reused
+    write_graph_key(DATA_PATH, graph_cache_key(PATIENT_DF_PATH, parent_key=graph_key, **build_params), build_params)
+
+    print(f"✅ Added {len(new_mapping_df)} patients (nodeIds {new_mapping_df['nodeId'].min()}-{new_mapping_df['nodeId'].max()})")
+    print(f"📊 New edges: {new_edges.nnz}")
@@ -0,0 +1,172 @@
+import numpy as np
+from scipy import sparse
+
+# Community quality metrics computed with sparse products over a node x community membership
+# matrix, or bincounts over a label array for disjoint partitions, instead of per-community
+# NetworkX subgraphs. Each function reproduces the cdlib evaluation function of the same name on
+# the same (symmetric, no self-loop) graph; partition_metrics also handles self-loops.
+
+
+def membership_matrix(communities, node_ids):
+    """
+    Boolean node x community CSR matrix of a (possibly overlapping) clustering, rows in node_ids
+    order. Community members that are not in node_ids are ignored.
+    """
+    node_index = {node: idx for idx, node in enumerate(np.asarray(node_ids).tolist())}
+    rows, cols = [], []
+    for comm_idx, community in enumerate(communities):
+        members = [node_index[node] for node in community if node in node_index]
+        rows.extend(members)
+        cols.extend([comm_idx] * len(members))
+    membership = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(len(node_index), len(communities))
+    )
+    membership.sum_duplicates()
+    return membership
+
+
+def inward_counts(adjacency, membership):
+    """
+    Unweighted neighbour counts: entry (i, c) of the result is the number of neighbours of node i
+    in community c, kept only where i itself belongs to c.
+    """
+    pattern = sparse.csr_matrix(adjacency, copy=True)
+    pattern.data = np.ones(len(pattern.data))
+    membership = sparse.csr_matrix(membership, dtype=np.float64)
+    return (pattern @ membership).multiply(membership).tocsc()
+
+
+def partition_metrics(adjacency, labels):
+    """
+    Metrics of a disjoint partition given as a community label per node (-1 for unassigned nodes),
+    from one pass over the edges with bincount. labels may also be a levels x nodes array, e.g. every
+    hierarchical Leiden level, to evaluate all partitions from the same edge scan; a list with one
+    result per row is returned then.
+    Each result holds the weighted Newman-Girvan "modularity" and the mean unweighted "conductance"
+    (as cdlib computes them), and per community, in the order of "community_ids": "size",
+    "cut" (edges leaving), "volume" (edge endpoints inside, 2 x internal edges + cut),
+    "community_conductance" (cut / volume, 0 without edges) and "internal_density"
+    (internal edges / member pairs, 0 below two members).
+    Unassigned nodes are ignored, except that their edges count as leaving for conductance; when
+    every node is assigned the values match cdlib's newman_girvan_modularity, conductance and
+    internal_edge_density.
+    """
+    labels = np.asarray(labels)
+    single = labels.ndim == 1
+    labels = np.atleast_2d(labels).astype(np.int64)
+    num_levels, n = labels.shape
+    num_labels = int(labels.max()) + 1 if labels.size else 0
+
+    upper = sparse.triu(sparse.csr_matrix(adjacency), k=0).tocoo()
+    total_weight = upper.data.sum()
+    if total_weight == 0:
+        raise ValueError("A graph without link has an undefined modularity")
+    # Weighted degrees with self-loops counted twice, as in NetworkX
+    degrees = np.asarray(adjacency.sum(axis=1)).ravel() + sparse.csr_matrix(adjacency).diagonal()
+
+    # Labels of both endpoints of every edge at every level, offset so each level has its own bins
+    offsets = np.arange(num_levels)[:, None] * num_labels
+    row_labels, col_labels = labels[:, upper.row], labels[:, upper.col]
+    internal = (row_labels == col_labels) & (row_labels >= 0)
+    leaving_row = (row_labels != col_labels) & (row_labels >= 0)
+    leaving_col = (row_labels != col_labels) & (col_labels >= 0)
+    edge_weights = np.broadcast_to(upper.data, row_labels.shape)
+    assigned = labels >= 0
+
+    num_bins = num_levels * num_labels
+    def count(bins, weights=None):
+        return np.bincount(bins, weights=weights, minlength=num_bins).reshape(num_levels, num_labels)
+
+    internal_weight = count((row_labels + offsets)[internal], edge_weights[internal])
+    internal_edges = count((row_labels + offsets)[internal])
+    cut = count((row_labels + offsets)[leaving_row]) + count((col_labels + offsets)[leaving_col])
+    degree_sum = count((labels + offsets)[assigned], np.broadcast_to(degrees, labels.shape)[assigned])
+    sizes = count((labels + offsets)[assigned])
+
+    results = []
+    for level in range(num_levels):
+        ids = np.flatnonzero(sizes[level] > 0)
+        size = sizes[level, ids]
+        edges_in = internal_edges[level, ids]
+        volume = 2 * edges_in + cut[level, ids]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            community_conductance = np.where(volume > 0, cut[level, ids] / volume, 0.0)
+            internal_density = np.where(size > 1, edges_in / (size * (size - 1) / 2), 0.0)
+        modularity = np.sum(
+            internal_weight[level, ids] / total_weight - (degree_sum[level, ids] / (2 * total_weight)) ** 2
+        )
+        results.append({
+            "modularity": float(modularity),
+            "conductance": float(community_conductance.mean()) if len(ids) else 0.0,
+            "community_ids": ids,
+            "size": size,
+            "cut": cut[level, ids],
+            "volume": volume,
+            "community_conductance": community_conductance,
+            "internal_density": internal_density,
+        })
+    return results[0] if single else results
+
+
+def primary_labels(membership):
+    """
+    Disjoint labels for a (possibly overlapping) membership matrix, -1 for nodes in no community.
+    As in cdlib's newman_girvan_modularity, a node in several communities keeps the one listed last
+    once communities are ordered by decreasing size (the NodeClustering order); labels are those
+    ranks.
+    """
+    membership = sparse.csr_matrix(membership)
+    sizes = np.asarray(membership.sum(axis=0)).ravel()
+    rank = np.empty(len(sizes), dtype=np.int64)
+    rank[np.argsort(-sizes, kind="stable")] = np.arange(len(sizes))
+    labels = np.full(membership.shape[0], -1)
+    coo = membership.tocoo()
+    np.maximum.at(labels, coo.row, rank[coo.col])
+    return labels
+
+
+def newman_girvan_modularity(adjacency, membership):
+    """
+    Weighted Newman-Girvan modularity of a membership matrix, overlapping nodes resolved as in cdlib
+    (see primary_labels); nodes in no community are ignored.
+    """
+    return partition_metrics(adjacency, primary_labels(membership))["modularity"]
+
+
+def conductance(adjacency, membership):
+    """
+    Mean unweighted conductance over communities: edges leaving the community over
+    (2 x internal edges + edges leaving), 0 for communities without any edge.
+    """
+    membership = sparse.csr_matrix(membership, dtype=np.float64)
+    degrees = np.diff(sparse.csr_matrix(adjacency).indptr).astype(np.float64)
+    inward = np.asarray(inward_counts(adjacency, membership).sum(axis=0)).ravel()
+    volume = membership.T @ degrees
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(volume > 0, (volume - inward) / volume, 0.0)
+    return float(ratio.mean()) if len(ratio) else 0.0
+
+
+def overlapping_modularity(adjacency, membership):
+    """
+    Unweighted overlapping modularity of Lazar et al. (cdlib modularity_overlap with weight=None):
+    mean over communities of (mean over members of (in - out) / (degree x number of memberships))
+    x (internal edge density), 0 for single-node communities.
+    """
+    membership = sparse.csr_matrix(membership, dtype=np.float64)
+    sizes = np.asarray(membership.sum(axis=0)).ravel()
+    if len(sizes) == 0:
+        return 0.0
+    degrees = np.diff(sparse.csr_matrix(adjacency).indptr).astype(np.float64)
+    affiliations = np.asarray(membership.sum(axis=1)).ravel()
+    inward = inward_counts(adjacency, membership)
+
+    # (in - out) / (deg * aff) = 2 in / (deg * aff) - 1 / aff, for members with deg > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        in_scale = np.where(degrees > 0, 2 / (degrees * affiliations), 0.0)
+        out_term = np.where(degrees > 0, 1 / affiliations, 0.0)
+    strength = np.asarray((sparse.diags(in_scale) @ inward).sum(axis=0)).ravel() - membership.T @ out_term
+    inward_total = np.asarray(inward.sum(axis=0)).ravel()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        scores = np.where(sizes > 1, (strength / sizes) * (inward_total / (sizes * (sizes - 1))), 0.0)
+    return float(scores.sum() / len(sizes))
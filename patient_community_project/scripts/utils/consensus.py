@@ -0,0 +1,57 @@
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import connected_components
+from utils.community_metrics import membership_matrix
+
+
+def accumulate_coassociation(agree, observed, rows, cols, communities, node_ids):
+    """
+    Adds one clustering run to the co-association counts of the edges (rows[e], cols[e]), in place.
+    observed[e] counts the runs in which both endpoints were assigned to some community, agree[e]
+    the runs in which they also shared one. Only existing edges are counted, so a run costs O(m)
+    and nothing of the run has to be kept afterwards.
+    """
+    membership = membership_matrix(communities, node_ids).astype(np.int32)
+    assigned = np.asarray(membership.sum(axis=1)).ravel() > 0
+    shared = np.asarray(membership[rows].multiply(membership[cols]).sum(axis=1)).ravel() > 0
+    observed += assigned[rows] & assigned[cols]
+    agree += shared
+
+
+def coassociation_fraction(agree, observed):
+    """
+    Fraction of the runs observing each edge in which its endpoints shared a community (0 if never observed).
+    """
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(observed > 0, agree / observed, 0.0)
+
+
+def consensus_partition(rows, cols, fraction, n, threshold=0.5):
+    """
+    Consensus communities: connected components of the edges whose endpoints shared a community
+    in at least `threshold` of the runs. Returns a label per node (positions 0..n-1).
+    """
+    keep = fraction >= threshold
+    graph = sparse.coo_matrix((np.ones(keep.sum()), (rows[keep], cols[keep])), shape=(n, n))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def node_stability(rows, cols, fraction, labels):
+    """
+    Per-node stability from the co-association of its edges: the mean fraction over the node's
+    edges inside its consensus community. A node alone in its consensus community scores
+    1 - (largest fraction over its edges) instead, i.e. how consistently it stayed apart
+    (1.0 for isolated nodes).
+    """
+    n = len(labels)
+    endpoints = np.concatenate([rows, cols])
+    values = np.concatenate([fraction, fraction])
+    inside = labels[endpoints] == np.concatenate([labels[cols], labels[rows]])
+
+    inside_sum = np.bincount(endpoints[inside], weights=values[inside], minlength=n)
+    inside_count = np.bincount(endpoints[inside], minlength=n)
+    max_fraction = np.zeros(n)
+    np.maximum.at(max_fraction, endpoints, values)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(inside_count > 0, inside_sum / inside_count, 1.0 - max_fraction)
@@ -0,0 +1,157 @@
+import numpy as np
+from scipy import sparse
+
+# Comparison of two overlapping covers held as node x community membership matrices whose rows
+# refer to the same node ids. Rows that are empty in both covers are dropped first, so each
+# metric runs on the union of the covered nodes, as cdlib does, and covers over different node
+# sets (e.g. after node removal) can be compared. omega, overlapping_nmi_lfk and
+# overlapping_nmi_mgh reproduce cdlib's omega, overlapping_normalized_mutual_information_LFK and
+# overlapping_normalized_mutual_information_MGH.
+
+
+def membership_from_labels(node_ids, community_ids):
+    """
+    Boolean membership matrix from (node id, community id) rows, e.g. a community_assignments.csv.
+    Returns (matrix, row node ids); rows are the sorted unique node ids and columns the sorted
+    unique community ids.
+    """
+    nodes, rows = np.unique(np.asarray(node_ids), return_inverse=True)
+    communities, cols = np.unique(np.asarray(community_ids), return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(rows), dtype=bool), (rows, cols)), shape=(len(nodes), len(communities))
+    )
+    matrix.sum_duplicates()
+    return matrix, nodes
+
+
+def align_rows(matrix, node_ids, target_ids):
+    """
+    Re-indexes the rows of a membership matrix from node_ids to target_ids (sorted); nodes missing
+    from target_ids are dropped and communities left empty are removed.
+    """
+    coo = sparse.coo_matrix(matrix)
+    positions = np.searchsorted(target_ids, np.asarray(node_ids))
+    found = positions < len(target_ids)
+    found[found] = np.asarray(target_ids)[positions[found]] == np.asarray(node_ids)[found]
+    keep = found[coo.row]
+    aligned = sparse.csr_matrix(
+        (coo.data[keep], (positions[coo.row[keep]], coo.col[keep])), shape=(len(target_ids), matrix.shape[1])
+    )
+    return aligned[:, np.asarray(aligned.sum(axis=0)).ravel() > 0]
+
+
+def covered_rows(first, second):
+    """
+    Both matrices restricted to the nodes that belong to some community in either cover.
+    """
+    first, second = sparse.csr_matrix(first, dtype=np.float64), sparse.csr_matrix(second, dtype=np.float64)
+    covered = (np.diff(first.indptr) > 0) | (np.diff(second.indptr) > 0)
+    return first[covered], second[covered]
+
+
+def omega(first, second):
+    """
+    Omega index: agreement of the number of communities every node pair shares in the two covers,
+    corrected for chance. The pair histograms come from the co-membership counts M M^T, so only
+    pairs sharing a community are visited.
+    """
+    first, second = covered_rows(first, second)
+    n = first.shape[0]
+    num_pairs = n * (n - 1) // 2
+    shared_first = sparse.triu(first @ first.T, k=1).tocsr()
+    shared_second = sparse.triu(second @ second.T, k=1).tocsr()
+    shared_first.eliminate_zeros()
+    shared_second.eliminate_zeros()
+
+    # Pair histograms by number of shared communities (pairs sharing none fill bin 0)
+    counts_first = np.bincount(shared_first.data.astype(np.int64), minlength=1)
+    counts_second = np.bincount(shared_second.data.astype(np.int64), minlength=1)
+    counts_first[0] = num_pairs - shared_first.nnz
+    counts_second[0] = num_pairs - shared_second.nnz
+
+    # Pairs with the same number of shared communities: none in either cover, or equal counts > 0
+    both = shared_first.multiply(shared_second > 0)
+    difference = (shared_first - shared_second).multiply(shared_second > 0).multiply(shared_first > 0)
+    difference.eliminate_zeros()
+    num_agreeing = (num_pairs - shared_first.nnz - shared_second.nnz + both.nnz) + (both.nnz - difference.nnz)
+
+    depth = min(len(counts_first), len(counts_second))
+    observed = num_agreeing / num_pairs
+    expected = np.sum(counts_first[:depth].astype(np.float64) * counts_second[:depth]) / num_pairs ** 2
+    if observed == expected == 1:
+        return 1.0
+    return float((observed - expected) / (1 - expected))
+
+
+def _h(p):
+    # -p log2 p, 0 at p = 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(p > 0, -p * np.log2(np.where(p > 0, p, 1)), 0.0)
+
+
+def _binary_entropy(p):
+    return _h(p) + _h(1 - p)
+
+
+def _conditional_entropies(first, second):
+    """
+    Best-match conditional entropies H(X_i | Y) of every community of first against second, from the
+    k1 x k2 intersection sizes. Returns (H(X_i | Y), H(X_i)) per community of first.
+    """
+    n = first.shape[0]
+    intersection = (first.T @ second).toarray()
+    size_first = np.asarray(first.sum(axis=0)).ravel()[:, None]
+    size_second = np.asarray(second.sum(axis=0)).ravel()[None, :]
+    d = intersection / n
+    c = (size_first - intersection) / n
+    b = (size_second - intersection) / n
+    a = 1 - b - c - d
+    # The pair only counts as informative when agreement outweighs disagreement (LFK constraint)
+    joint = _h(a) + _h(b) + _h(c) + _h(d)
+    pair_entropy = np.where(
+        _h(a) + _h(d) > _h(b) + _h(c),
+        joint - _binary_entropy(size_second / n),
+        np.broadcast_to(_binary_entropy(size_first / n), joint.shape),
+    )
+    return pair_entropy.min(axis=1), _binary_entropy(size_first.ravel() / n)
+
+
+def _overlapping_nmi(first, second, variant):
+    first, second = covered_rows(first, second)
+    if (first.shape[1] == 0) != (second.shape[1] == 0):
+        return 0.0
+    if first.shape == second.shape and (first != second).nnz == 0:
+        return 1.0
+    cond_first, entropy_first = _conditional_entropies(first, second)
+    cond_second, entropy_second = _conditional_entropies(second, first)
+    if variant == "LFK":
+        normalized_first = np.where(entropy_first > 0, cond_first / np.where(entropy_first > 0, entropy_first, 1), 1.0)
+        normalized_second = np.where(entropy_second > 0, cond_second / np.where(entropy_second > 0, entropy_second, 1), 1.0)
+        return float(1 - 0.5 * (normalized_first.mean() + normalized_second.mean()))
+    mutual = 0.5 * (entropy_first.sum() - cond_first.sum() + entropy_second.sum() - cond_second.sum())
+    return float(mutual / max(entropy_first.sum(), entropy_second.sum()))
+
+
+def overlapping_nmi_lfk(first, second):
+    """
+    Overlapping NMI of Lancichinetti et al., normalised community by community.
+    """
+    return _overlapping_nmi(first, second, "LFK")
+
+
+def overlapping_nmi_mgh(first, second):
+    """
+    Overlapping NMI of McDaid et al., normalised by the larger cover entropy.
+    """
+    return _overlapping_nmi(first, second, "MGH")
+
+
+def lowest_community_labels(matrix):
+    """
+    Disjoint label per row: the lowest community column the node belongs to, -1 for none.
+    """
+    coo = sparse.coo_matrix(matrix)
+    labels = np.full(matrix.shape[0], matrix.shape[1])
+    np.minimum.at(labels, coo.row, coo.col)
+    labels[labels == matrix.shape[1]] = -1
+    return labels
@@ -0,0 +1,122 @@
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+from scipy import sparse
+from utils.graph_construction import edges_to_adjacency
+from utils.graph_io import csr_graph_exists, save_csr_graph, load_csr_graph, CSR_DIRNAME, GML_FILENAME
+from utils.incremental import SCALER_FILENAME
+
+# Built graphs are cached under <cache_root>/<key>/, where key hashes the input CSV content
+# and every build parameter, so a cache entry can never be served for different inputs.
+KEY_FILENAME = "graph_key.json"
+# Files a graph directory holds for its graph (results live in subdirectories next to them)
+GRAPH_ARTIFACTS = (CSR_DIRNAME, GML_FILENAME, KEY_FILENAME, SCALER_FILENAME)
+
+
+def file_digest(path):
+    """
+    sha256 of a file's content, read in 1 MB chunks.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def graph_cache_key(csv_path, **params):
+    """
+    Returns a sha256 key over the content of csv_path and the (JSON-serialized) build parameters.
+    Further input files can be covered by passing their file_digest as a parameter.
+    """
+    digest = hashlib.sha256(file_digest(csv_path).encode())
+    digest.update(json.dumps(params, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+def cached_graph_dir(cache_root, key):
+    return os.path.join(cache_root, key)
+
+
+def load_cached_edges(cache_root, key):
+    """
+    Returns the cached upper-triangular edge set for key, or None on a cache miss.
+    """
+    cache_dir = cached_graph_dir(cache_root, key)
+    if not csr_graph_exists(cache_dir):
+        return None
+    adjacency, _ = load_csr_graph(cache_dir, mmap_mode=None)
+    return sparse.triu(adjacency, k=1).tocoo()
+
+
+def store_cached_edges(cache_root, key, edges, params):
+    """
+    Saves an edge set under its key together with the parameters that produced it.
+    """
+    cache_dir = cached_graph_dir(cache_root, key)
+    save_csr_graph(cache_dir, edges_to_adjacency(edges))
+    with open(os.path.join(cache_dir, KEY_FILENAME), "w") as f:
+        json.dump({"key": key, "params": params}, f, indent=2, default=str)
+
+
+def publish_cached_graph(cache_root, key, graph_dir):
+    """
+    Replaces the graph stored in graph_dir with a cache entry (binary graph, key file and any other
+    artifacts). The entry is first copied into a temporary directory inside graph_dir; the graph
+    artifacts of the previous build are then removed, so none of them survive next to the new
+    graph, and the copies are renamed into place. Results subdirectories are left untouched.
+    """
+    cache_dir = cached_graph_dir(cache_root, key)
+    os.makedirs(graph_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=".publish-", dir=graph_dir)
+    try:
+        names = os.listdir(cache_dir)
+        for name in names:
+            source = os.path.join(cache_dir, name)
+            if os.path.isdir(source):
+                shutil.copytree(source, os.path.join(staging_dir, name))
+            else:
+                shutil.copy2(source, staging_dir)
+        for name in set(GRAPH_ARTIFACTS) | set(names):
+            path = os.path.join(graph_dir, name)
+            if os.path.isdir(path):
+                shutil.rmtree(path)
+            elif os.path.exists(path):
+                os.remove(path)
+        for name in names:
+            os.replace(os.path.join(staging_dir, name), os.path.join(graph_dir, name))
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+
+
+def read_graph_key(graph_dir):
+    """
+    Returns the cache key of the graph (or results) stored in graph_dir, or None if unknown.
+    """
+    key_path = os.path.join(graph_dir, KEY_FILENAME)
+    if not os.path.exists(key_path):
+        return None
+    with open(key_path) as f:
+        return json.load(f)["key"]
+
+
+def read_graph_params(graph_dir):
+    """
+    Returns the build parameters recorded next to the graph in graph_dir, or None if unknown.
+    """
+    key_path = os.path.join(graph_dir, KEY_FILENAME)
+    if not os.path.exists(key_path):
+        return None
+    with open(key_path) as f:
+        return json.load(f).get("params")
+
+
+def write_graph_key(output_dir, key, params=None):
+    """
+    Records which graph a results directory was computed from, so results are only reused for that graph.
+    """
+    entry = {"key": key} if params is None else {"key": key, "params": params}
+    with open(os.path.join(output_dir, KEY_FILENAME), "w") as f:
+        json.dump(entry, f, indent=2, default=str)
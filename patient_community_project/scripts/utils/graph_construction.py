@@ -0,0 +1,60 @@
+import numpy as np
+import networkx as nx
+from scipy import sparse
+
+
+def prepare_response_features(df, features):
+    """
+    Selects patientId and the response features, drops incomplete rows and converts the
+    "<code>:<label>" status columns (e.g. "1:DECEASED") to their integer code.
+    """
+    response_df = df[['patientId'] + features].dropna()
+    for col in ('FFS_STATUS', 'OS_STATUS'):
+        if col in features:
+            response_df[col] = response_df[col].map(lambda x: int(x[0]))
+    return response_df
+
+
+def edges_to_adjacency(edges):
+    """
+    Converts an upper-triangular edge set (COO) into a symmetric CSR adjacency matrix.
+    """
+    edges = sparse.coo_matrix(edges)
+    return (edges + edges.T).tocsr()
+
+
+def node_degrees(edges):
+    """
+    Returns the (unweighted) degree of every node of an upper-triangular edge set.
+    """
+    edges = sparse.coo_matrix(edges)
+    n = edges.shape[0]
+    return np.bincount(edges.row, minlength=n) + np.bincount(edges.col, minlength=n)
+
+
+def graph_summary(edges):
+    """
+    Returns node count, edge count, average degree and density of an edge set
+    without building a NetworkX graph.
+    """
+    n = edges.shape[0]
+    m = edges.nnz
+    degrees = node_degrees(edges)
+    return {
+        "num_nodes": n,
+        "num_edges": m,
+        "avg_degree": float(degrees.mean()) if n > 0 else 0.0,
+        "density": 2 * m / (n * (n - 1)) if n > 1 else 0.0,
+    }
+
+
+def edges_to_networkx(edges, patient_ids):
+    """
+    Builds a NetworkX graph from an upper-triangular edge set.
+    Nodes are 0..n-1 with a patientId attribute, edges carry the similarity as weight.
+    """
+    edges = sparse.coo_matrix(edges)
+    G = nx.Graph()
+    G.add_nodes_from((idx, {"patientId": patient_id}) for idx, patient_id in enumerate(patient_ids))
+    G.add_weighted_edges_from(zip(edges.row.tolist(), edges.col.tolist(), edges.data.tolist()))
+    return G
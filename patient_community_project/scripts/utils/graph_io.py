@@ -0,0 +1,112 @@
+import os
+import numpy as np
+import networkx as nx
+from scipy import sparse
+
+# Binary graph layout inside a graph directory (e.g. data/<GRAPH_NAME>/graph_csr/):
+#   indptr.npy, indices.npy, weights.npy - symmetric CSR adjacency over positions 0..n-1
+#   node_ids.npy                         - nodeId of each position (see patient_id_mapping.csv)
+CSR_DIRNAME = "graph_csr"
+GML_FILENAME = "graph.gml"
+
+
+def csr_graph_exists(graph_dir):
+    return os.path.exists(os.path.join(graph_dir, CSR_DIRNAME, "indptr.npy"))
+
+
+def save_csr_graph(graph_dir, adjacency, node_ids=None):
+    """
+    Saves a symmetric CSR adjacency matrix and its node ids as raw .npy arrays.
+    node_ids defaults to 0..n-1, i.e. positions are the nodeIds of patient_id_mapping.csv.
+    """
+    adjacency = sparse.csr_matrix(adjacency)
+    adjacency.sort_indices()
+    n = adjacency.shape[0]
+    if node_ids is None:
+        node_ids = np.arange(n)
+    csr_dir = os.path.join(graph_dir, CSR_DIRNAME)
+    os.makedirs(csr_dir, exist_ok=True)
+    np.save(os.path.join(csr_dir, "indptr.npy"), adjacency.indptr.astype(np.int64))
+    np.save(os.path.join(csr_dir, "indices.npy"), adjacency.indices.astype(np.int32))
+    np.save(os.path.join(csr_dir, "weights.npy"), adjacency.data.astype(np.float64))
+    np.save(os.path.join(csr_dir, "node_ids.npy"), np.asarray(node_ids, dtype=np.int64))
+
+
+def load_csr_graph(graph_dir, mmap_mode="r"):
+    """
+    Loads the CSR adjacency matrix and node ids saved by save_csr_graph.
+    With mmap_mode="r" (default) the arrays are memory-mapped instead of read into memory.
+    Returns (adjacency, node_ids).
+    """
+    csr_dir = os.path.join(graph_dir, CSR_DIRNAME)
+    indptr = np.load(os.path.join(csr_dir, "indptr.npy"), mmap_mode=mmap_mode)
+    indices = np.load(os.path.join(csr_dir, "indices.npy"), mmap_mode=mmap_mode)
+    weights = np.load(os.path.join(csr_dir, "weights.npy"), mmap_mode=mmap_mode)
+    node_ids = np.load(os.path.join(csr_dir, "node_ids.npy"), mmap_mode=mmap_mode)
+    n = len(indptr) - 1
+    adjacency = sparse.csr_matrix((weights, indices, indptr), shape=(n, n), copy=False)
+    return adjacency, node_ids
+
+
+def node_positions(node_ids, ids):
+    """
+    Positions of ids among the sorted node ids of a CSR graph (see load_csr_graph).
+    Returns (positions, found); positions are only meaningful where found is True.
+    """
+    node_ids, ids = np.asarray(node_ids), np.asarray(ids)
+    positions = np.searchsorted(node_ids, ids)
+    found = positions < len(node_ids)
+    found[found] = node_ids[positions[found]] == ids[found]
+    return positions, found
+
+
+def csr_to_networkx(adjacency, node_ids):
+    """
+    Builds a weighted NetworkX graph whose node labels are the given node ids.
+    """
+    upper = sparse.triu(adjacency, k=1).tocoo()
+    node_ids = np.asarray(node_ids)
+    G = nx.Graph()
+    G.add_nodes_from(node_ids.tolist())
+    G.add_weighted_edges_from(zip(node_ids[upper.row].tolist(), node_ids[upper.col].tolist(), upper.data.tolist()))
+    return G
+
+
+def networkx_to_csr(G):
+    """
+    Converts a NetworkX graph with integer node labels into (adjacency, node_ids), nodes sorted by id.
+    Missing edge weights are stored as 1.0.
+    """
+    node_ids = np.array(sorted(G.nodes()), dtype=np.int64)
+    adjacency = nx.to_scipy_sparse_array(G, nodelist=node_ids.tolist(), weight="weight", format="csr")
+    return sparse.csr_matrix(adjacency), node_ids
+
+
+def load_graph(graph_dir):
+    """
+    Loads the graph stored in graph_dir as a NetworkX graph with integer node ids.
+    Falls back to parsing graph.gml when the directory has not been converted yet (see convert_graph.py).
+    """
+    if csr_graph_exists(graph_dir):
+        return csr_to_networkx(*load_csr_graph(graph_dir))
+    gml_path = os.path.join(graph_dir, GML_FILENAME)
+    print(f"⚠️ No binary graph in {graph_dir}, reading {gml_path}")
+    return nx.read_gml(gml_path, label='id')
+
+
+def save_graph(graph_dir, G, export_gml=False):
+    """
+    Saves a NetworkX graph in the binary CSR format. graph.gml is only written when export_gml is True.
+    """
+    save_csr_graph(graph_dir, *networkx_to_csr(G))
+    if export_gml:
+        nx.write_gml(G, os.path.join(graph_dir, GML_FILENAME))
+
+
+def convert_gml(graph_dir):
+    """
+    Converts an existing graph_dir/graph.gml into the binary CSR format.
+    """
+    G = nx.read_gml(os.path.join(graph_dir, GML_FILENAME), label='id')
+    save_csr_graph(graph_dir, *networkx_to_csr(G))
+    return G
@@ -0,0 +1,70 @@
+import os
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from utils.similarity import similarity_edges, cross_similarity_edges
+from utils.graph_io import load_csr_graph, save_csr_graph
+
+# Scaler statistics (and euclidean normalizer) of the cohort a graph was built from.
+# New patients are scaled with these frozen values so existing edge weights stay valid.
+SCALER_FILENAME = "feature_scaler.npz"
+
+
+def save_feature_scaler(graph_dir, scaler, max_dist=None):
+    os.makedirs(graph_dir, exist_ok=True)
+    np.savez(
+        os.path.join(graph_dir, SCALER_FILENAME),
+        mean=scaler.mean_,
+        scale=scaler.scale_,
+        max_dist=np.nan if max_dist is None else max_dist,
+    )
+
+
+def load_feature_scaler(graph_dir):
+    """
+    Returns (mean, scale, max_dist) saved by save_feature_scaler; max_dist is None for cosine graphs.
+    """
+    path = os.path.join(graph_dir, SCALER_FILENAME)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found, rebuild the graph with build_graph.py first")
+    stats = np.load(path)
+    max_dist = float(stats["max_dist"])
+    return stats["mean"], stats["scale"], None if np.isnan(max_dist) else max_dist
+
+
+def new_patient_edges(X_existing, X_new, similarity_type, threshold, max_dist=None):
+    """
+    Edges between new patients and the existing cohort plus among the new patients themselves,
+    in the index space of the enlarged graph (existing nodes 0..n-1, new nodes n..n+k-1).
+    Costs O(n * k) similarities instead of O((n + k)^2).
+    """
+    n, k = X_existing.shape[0], X_new.shape[0]
+    cross = cross_similarity_edges(X_existing, X_new, similarity_type, threshold, max_dist=max_dist)
+    within = similarity_edges(X_new, similarity_type, threshold, max_dist=max_dist)
+    rows = np.concatenate([cross.row, within.row + n])
+    cols = np.concatenate([cross.col + n, within.col + n])
+    weights = np.concatenate([cross.data, within.data])
+    return sparse.coo_matrix((weights, (rows, cols)), shape=(n + k, n + k))
+
+
+def append_patients(graph_dir, new_edges, new_patient_ids):
+    """
+    Adds new nodes and their edges to the binary graph in graph_dir and appends them to
+    patient_id_mapping.csv. Existing nodeIds are never renumbered.
+    """
+    adjacency, node_ids = load_csr_graph(graph_dir, mmap_mode=None)
+    n_total = new_edges.shape[0]
+    n_new = len(new_patient_ids)
+    indptr = np.concatenate([adjacency.indptr, np.full(n_total - adjacency.shape[0], adjacency.indptr[-1])])
+    adjacency = sparse.csr_matrix((adjacency.data, adjacency.indices, indptr), shape=(n_total, n_total))
+    adjacency = adjacency + new_edges + new_edges.T
+
+    mapping_path = os.path.join(graph_dir, "patient_id_mapping.csv")
+    mapping_df = pd.read_csv(mapping_path)
+    first_node_id = int(mapping_df["nodeId"].max()) + 1 if len(mapping_df) else 0
+    new_node_ids = np.arange(first_node_id, first_node_id + n_new)
+    new_mapping_df = pd.DataFrame({"patientId": list(new_patient_ids), "nodeId": new_node_ids})
+
+    save_csr_graph(graph_dir, adjacency, np.concatenate([node_ids, new_node_ids]))
+    pd.concat([mapping_df, new_mapping_df], ignore_index=True).to_csv(mapping_path, index=False)
+    return new_mapping_df
@@ -0,0 +1,66 @@
+import numpy as np
+from scipy import sparse
+from sklearn.neighbors import NearestNeighbors
+from sklearn.preprocessing import normalize
+from utils.similarity import max_pairwise_distance
+
+KNN_MODES = ("knn", "mutual_knn", "threshold_knn")
+
+
+def knn_edges(X, similarity_type, k, mode="knn", threshold=None, max_dist=None):
+    """
+    Builds a k-nearest-neighbour patient graph from a ball tree instead of all-pairs similarity.
+    Returns the same upper-triangular COO edge set (weights = normalized similarity) as similarity_edges.
+    mode:
+        "knn"           - edge if j is among the k nearest neighbours of i or vice versa
+        "mutual_knn"    - edge only if i and j are among each other's k nearest neighbours,
+                          so no node has more than k edges
+        "threshold_knn" - kNN edges that also reach the similarity threshold, which keeps
+                          outliers from being forced onto distant neighbours
+    Cosine neighbours are searched on L2-normalized rows, where euclidean order matches cosine order.
+    max_dist: euclidean normalizer; computed from X when not given
+    """
+    if mode not in KNN_MODES:
+        raise ValueError(f"Unknown kNN mode: {mode}")
+    if mode == "threshold_knn" and threshold is None:
+        raise ValueError("threshold_knn mode requires a threshold")
+
+    X = np.asarray(X, dtype=np.float64)
+    n = X.shape[0]
+    k = min(k, n - 1)
+    if k < 1:
+        return sparse.coo_matrix((n, n))
+
+    if similarity_type == "cosine":
+        Z = normalize(X)
+    elif similarity_type == "euclidean":
+        Z = X
+        if max_dist is None:
+            max_dist = max_pairwise_distance(X)
+    else:
+        raise ValueError(f"Unknown similarity type: {similarity_type}")
+
+    nn = NearestNeighbors(n_neighbors=k, algorithm="ball_tree").fit(Z)
+    # Without a query argument the indexed points are not returned as their own neighbours
+    dist, ind = nn.kneighbors()
+
+    if similarity_type == "cosine":
+        # For unit vectors ||a - b||^2 = 2 - 2 cos(a, b), so (cos + 1) / 2 = 1 - ||a - b||^2 / 4
+        sim = 1 - dist ** 2 / 4
+    else:
+        sim = 1 - dist / max_dist if max_dist > 0 else 1 - dist
+
+    rows = np.repeat(np.arange(n), k)
+    cols = ind.ravel()
+    weights = sim.ravel()
+    if mode == "threshold_knn":
+        keep = weights >= threshold
+        rows, cols, weights = rows[keep], cols[keep], weights[keep]
+
+    directed = sparse.csr_matrix((weights, (rows, cols)), shape=(n, n))
+    if mode == "mutual_knn":
+        linked = directed.astype(bool)
+        undirected = directed.multiply(linked.multiply(linked.T))
+    else:
+        undirected = directed.maximum(directed.T)
+    return sparse.triu(undirected, k=1).tocoo()
@@ -0,0 +1,72 @@
+import numpy as np
+import pandas as pd
+from math import log
+
+# External (NMI / ARI) evaluation against clinical labels on integer-coded arrays: the clinical
+# table is joined to the graph nodes once, and every partition is then scored from a contingency
+# table built with one bincount. Scores reproduce sklearn's normalized_mutual_info_score
+# (arithmetic normalisation) and adjusted_rand_score.
+
+
+def clinical_label_codes(node_ids, node_to_patient, patient_df, label_columns):
+    """
+    Joins the clinical table to the graph nodes once by nodeId -> patientId. Returns an integer code
+    array of shape (len(label_columns), len(node_ids)), -1 where the node has no patient, the patient
+    is not in patient_df or the label is missing.
+    """
+    patients = pd.Series(np.asarray(node_ids)).map(node_to_patient)
+    table = patient_df.drop_duplicates("patientId").set_index("patientId").reindex(patients)
+    return np.vstack([pd.factorize(table[column])[0] for column in label_columns])
+
+
+def contingency_table(true_codes, pred_codes):
+    """
+    Dense contingency table (true x predicted) of two labelings of the same nodes, codes >= 0,
+    from a single bincount. Labels that do not occur are dropped.
+    """
+    _, true_codes = np.unique(true_codes, return_inverse=True)
+    _, pred_codes = np.unique(pred_codes, return_inverse=True)
+    num_true = true_codes.max() + 1 if len(true_codes) else 0
+    num_pred = pred_codes.max() + 1 if len(pred_codes) else 0
+    return np.bincount(true_codes * num_pred + pred_codes, minlength=num_true * num_pred).reshape(num_true, num_pred)
+
+
+def _entropy(counts):
+    total = counts.sum()
+    return -np.sum((counts / total) * (np.log(counts) - log(total)))
+
+
+def nmi_ari(table):
+    """
+    NMI and ARI of a contingency table. Returns (nmi, ari).
+    """
+    n = int(table.sum())
+    true_counts, pred_counts = table.sum(axis=1), table.sum(axis=0)
+
+    # NMI: both labelings unsplit (or empty) is a perfect match
+    if table.shape[0] == table.shape[1] and table.shape[0] <= 1:
+        nmi = 1.0
+    elif table.shape[0] == 1 or table.shape[1] == 1:
+        nmi = 0.0
+    else:
+        rows, cols = np.nonzero(table)
+        values = table[rows, cols].astype(np.float64)
+        outer = true_counts[rows].astype(np.int64) * pred_counts[cols].astype(np.int64)
+        mi = (values / n) * (np.log(values) - log(n)) + (values / n) * (-np.log(outer) + 2 * log(n))
+        mi = np.where(np.abs(mi) < np.finfo(mi.dtype).eps, 0.0, mi)
+        mi = float(np.clip(mi.sum(), 0.0, None))
+        nmi = 0.0 if mi == 0 else mi / ((_entropy(true_counts) + _entropy(pred_counts)) / 2)
+
+    # ARI from the pair confusion matrix, in Python integers
+    sum_squares = int((table.astype(np.int64) ** 2).sum())
+    false_pos = int((pred_counts.astype(np.int64) ** 2).sum()) - sum_squares
+    false_neg = int((true_counts.astype(np.int64) ** 2).sum()) - sum_squares
+    true_pos = sum_squares - n
+    true_neg = n * n - false_pos - false_neg - sum_squares
+    if false_neg == 0 and false_pos == 0:
+        ari = 1.0
+    else:
+        ari = 2.0 * (true_pos * true_neg - false_neg * false_pos) / (
+            (true_pos + false_neg) * (false_neg + true_neg) + (true_pos + false_pos) * (false_pos + true_neg)
+        )
+    return float(nmi), float(ari)
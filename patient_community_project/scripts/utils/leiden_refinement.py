@@ -0,0 +1,73 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from scipy import sparse
+from graspologic.partition import leiden
+from utils.shared_graph import share_csr, attach_csr, release_blocks
+
+# Graph arrays attached from shared memory, set once per worker process by init_leiden_worker
+_shared = {}
+
+
+def init_leiden_worker(spec, node_ids, random_seed):
+    adjacency, blocks = attach_csr(spec)
+    _shared.update(adjacency=adjacency, blocks=blocks, node_ids=node_ids, random_seed=random_seed)
+
+
+def leiden_subgraph(adjacency, node_ids, positions, random_seed):
+    """
+    Runs Leiden on the subgraph induced by the node positions, passed to graspologic as an edge list
+    sliced from the CSR matrix. Nodes without edges in the subgraph are left out, as graspologic
+    does for NetworkX input.
+    Returns communities as lists of node ids, in order of first appearance in the partition.
+    """
+    upper = sparse.triu(adjacency[positions][:, positions], k=1).tocoo()
+    if upper.nnz == 0:
+        return []
+    sub_ids = np.asarray(node_ids)[positions]
+    edges = list(zip(sub_ids[upper.row].tolist(), sub_ids[upper.col].tolist(), upper.data.tolist()))
+    comm_map = {}
+    for node, comm in leiden(edges, random_seed=random_seed).items():
+        comm_map.setdefault(comm, []).append(node)
+    return list(comm_map.values())
+
+
+def run_leiden_batch(batch):
+    return [
+        leiden_subgraph(_shared["adjacency"], _shared["node_ids"], positions, _shared["random_seed"])
+        for positions in batch
+    ]
+
+
+def batch_groups(groups, min_batch_nodes):
+    """
+    Packs consecutive groups into batches of at least min_batch_nodes nodes (the last batch may be
+    smaller), so tiny groups share one task. Returns lists of group indices.
+    """
+    batches, current, current_nodes = [], [], 0
+    for idx, group in enumerate(groups):
+        current.append(idx)
+        current_nodes += len(group)
+        if current_nodes >= min_batch_nodes:
+            batches.append(current)
+            current, current_nodes = [], 0
+    if current:
+        batches.append(current)
+    return batches
+
+
+def leiden_on_subgraphs(adjacency, node_ids, groups, random_seed=42, min_batch_nodes=50, max_workers=None):
+    """
+    Runs Leiden independently on the subgraph of every group of node positions, in a process pool
+    over the CSR arrays shared read-only with the workers (see shared_graph). Groups smaller than
+    min_batch_nodes are batched with their neighbours in the list to amortize dispatch overhead.
+    Returns one list of communities per group, in the order of groups.
+    """
+    batches = batch_groups(groups, min_batch_nodes)
+    blocks, spec = share_csr(adjacency)
+    try:
+        init_args = (spec, np.asarray(node_ids), random_seed)
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_leiden_worker, initargs=init_args) as executor:
+            batch_results = executor.map(run_leiden_batch, [[groups[idx] for idx in batch] for batch in batches])
+            return [result for results in batch_results for result in results]
+    finally:
+        release_blocks(blocks)
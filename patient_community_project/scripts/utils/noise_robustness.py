@@ -0,0 +1,64 @@
+import numpy as np
+from utils.graph_construction import edges_to_adjacency, graph_summary, node_degrees
+from utils.graph_io import save_csr_graph
+from utils.similarity import similarity_edges
+
+# Read-only inputs shared by every replica, set once per worker process by init_noise_worker
+_shared = {}
+
+
+def init_noise_worker(X_base, raw_noise_values, mean, scale, noise_idx, base_edges, similarity_type, threshold):
+    _shared.update(
+        X_base=X_base,
+        raw_noise_values=raw_noise_values,
+        mean=mean,
+        scale=scale,
+        noise_idx=noise_idx,
+        base_edges=base_edges,
+        similarity_type=similarity_type,
+        threshold=threshold,
+    )
+
+
+def noisy_features(X_base, raw_noise_values, mean, scale, noise_idx, noise_std, rng):
+    """
+    Adds Gaussian noise to the raw values of the noise columns and rescales only those columns
+    with the scaler of the clean cohort. All other columns are reused from X_base.
+    """
+    X = X_base.copy()
+    noise = rng.normal(loc=0, scale=noise_std, size=raw_noise_values.shape)
+    X[:, noise_idx] = (raw_noise_values + noise - mean[noise_idx]) / scale[noise_idx]
+    return X
+
+
+def edge_jaccard(edges_a, edges_b):
+    """
+    Jaccard overlap of two upper-triangular edge sets over the same nodes.
+    """
+    n = edges_a.shape[0]
+    keys_a = edges_a.row.astype(np.int64) * n + edges_a.col
+    keys_b = edges_b.row.astype(np.int64) * n + edges_b.col
+    shared = len(np.intersect1d(keys_a, keys_b, assume_unique=True))
+    union = len(keys_a) + len(keys_b) - shared
+    return shared / union if union > 0 else 1.0
+
+
+def run_noise_replica(noise_std, replica, seed, output_dir):
+    """
+    Builds the graph for one (noise_std, replica) pair, saves it to output_dir and returns its metrics.
+    The noise stream depends only on (seed, replica), so every noise level of a replica is the
+    same standard-normal draw scaled by noise_std.
+    """
+    rng = np.random.default_rng([seed, replica])
+    X = noisy_features(
+        _shared["X_base"], _shared["raw_noise_values"], _shared["mean"], _shared["scale"],
+        _shared["noise_idx"], noise_std, rng,
+    )
+    edges = similarity_edges(X, _shared["similarity_type"], _shared["threshold"])
+    save_csr_graph(output_dir, edges_to_adjacency(edges))
+
+    metrics = {"noise_std": noise_std, "replica": replica}
+    metrics.update(graph_summary(edges))
+    metrics["num_isolated_nodes"] = int((node_degrees(edges) == 0).sum())
+    metrics["edge_jaccard_vs_clean"] = edge_jaccard(edges, _shared["base_edges"])
+    return metrics
@@ -0,0 +1,122 @@
+from collections import namedtuple
+import numpy as np
+from scipy import sparse
+
+PERTURBATION_MODES = ("edge", "node", "rewire", "add")
+
+# A perturbed copy of a base graph, stored as masks over the base edge/node arrays
+# plus the (few) edges that do not exist in the base graph.
+Replica = namedtuple(
+    "Replica",
+    ["mode", "rate", "replica", "seed", "edge_mask", "node_mask", "added_rows", "added_cols", "added_weights"],
+)
+
+
+def base_edge_arrays(adjacency):
+    """
+    Upper-triangular (rows, cols, weights, keys) of a symmetric adjacency matrix, shared by all
+    replicas. Edges are sorted by their int64 key rows * n + cols, so keys can be searched directly.
+    """
+    n = adjacency.shape[0]
+    upper = sparse.triu(adjacency, k=1).tocoo()
+    keys = upper.row.astype(np.int64) * n + upper.col
+    order = np.argsort(keys, kind="stable")
+    return upper.row[order], upper.col[order], upper.data[order], keys[order]
+
+
+def sample_non_edges(n, count, edge_keys, rng):
+    """
+    Draws `count` distinct node pairs (i < j) that are not edges of the base graph, given the sorted
+    edge keys of base_edge_arrays. Pairs are kept in the order they are drawn.
+    """
+    if count > n * (n - 1) // 2 - len(edge_keys):
+        raise ValueError(f"Cannot add {count} edges, the graph does not have that many non-adjacent pairs")
+    chosen = np.empty(0, dtype=np.int64)
+    while len(chosen) < count:
+        i = rng.integers(0, n, size=2 * (count - len(chosen)))
+        j = rng.integers(0, n, size=len(i))
+        lo, hi = np.minimum(i, j), np.maximum(i, j)
+        keys = lo[lo != hi].astype(np.int64) * n + hi[lo != hi]
+        positions = np.searchsorted(edge_keys, keys)
+        is_edge = positions < len(edge_keys)
+        is_edge[is_edge] = edge_keys[positions[is_edge]] == keys[is_edge]
+        keys = keys[~is_edge]
+        # First draw of every pair not chosen in an earlier round
+        _, first = np.unique(keys, return_index=True)
+        keys = keys[np.sort(first)]
+        keys = keys[~np.isin(keys, chosen)]
+        chosen = np.concatenate([chosen, keys[:count - len(chosen)]])
+    return chosen // n, chosen % n
+
+
+def make_replica(base, n, mode, rate, replica, seed):
+    """
+    Builds one replica from its own random stream.
+    edge:   remove int(rate * m) edges            node: remove int(rate * n) nodes
+    rewire: move int(rate * m) edges to random non-adjacent pairs, keeping their weights
+    add:    add int(rate * m) edges between random non-adjacent pairs, weights drawn from existing edges
+    """
+    if mode not in PERTURBATION_MODES:
+        raise ValueError(f"Unknown perturbation mode: {mode}")
+    rows, cols, weights, edge_keys = base
+    rng = np.random.default_rng(seed)
+    m = len(weights)
+    edge_mask = np.ones(m, dtype=bool)
+    node_mask = np.ones(n, dtype=bool)
+    added_rows = added_cols = np.empty(0, dtype=np.int64)
+    added_weights = np.empty(0, dtype=weights.dtype)
+
+    if mode == "node":
+        node_mask[rng.choice(n, size=int(rate * n), replace=False)] = False
+        edge_mask = node_mask[rows] & node_mask[cols]
+    elif mode in ("edge", "rewire"):
+        removed = rng.choice(m, size=int(rate * m), replace=False)
+        edge_mask[removed] = False
+        if mode == "rewire":
+            added_rows, added_cols = sample_non_edges(n, len(removed), edge_keys, rng)
+            added_weights = weights[removed]
+    else:
+        count = int(rate * m)
+        added_rows, added_cols = sample_non_edges(n, count, edge_keys, rng)
+        added_weights = weights[rng.integers(0, m, size=count)]
+
+    return Replica(mode, rate, replica, seed, edge_mask, node_mask, added_rows, added_cols, added_weights)
+
+
+def generate_replicas(base, n, modes, rates, num_replicas, seed=42):
+    """
+    Lazily yields num_replicas replicas for every (mode, rate) over one shared base edge array.
+    Each replica gets an independent random stream spawned from `seed`, so replicas are
+    reproducible individually and do not depend on generation order.
+    """
+    settings = [(mode, rate) for mode in modes for rate in rates]
+    streams = np.random.SeedSequence(seed).spawn(len(settings) * num_replicas)
+    for idx, (mode, rate) in enumerate(settings):
+        for replica in range(num_replicas):
+            replica_seed = int(streams[idx * num_replicas + replica].generate_state(1)[0])
+            yield make_replica(base, n, mode, rate, replica, replica_seed)
+
+
+def replica_edges(base, replica):
+    """
+    Returns the upper-triangular (rows, cols, weights) of a replica.
+    """
+    rows, cols, weights, _ = base
+    return (
+        np.concatenate([rows[replica.edge_mask], replica.added_rows]),
+        np.concatenate([cols[replica.edge_mask], replica.added_cols]),
+        np.concatenate([weights[replica.edge_mask], replica.added_weights]),
+    )
+
+
+def replica_csr(base, node_ids, replica):
+    """
+    Materializes a replica in memory as a symmetric CSR adjacency (removed nodes are dropped) for
+    the detection step. Returns (adjacency, node_ids).
+    """
+    n = len(node_ids)
+    rows, cols, weights = replica_edges(base, replica)
+    upper = sparse.csr_matrix((weights, (rows, cols)), shape=(n, n))
+    keep = np.flatnonzero(replica.node_mask)
+    upper = upper[keep][:, keep]
+    return (upper + upper.T).tocsr(), np.asarray(node_ids)[keep]
@@ -0,0 +1,45 @@
+from multiprocessing import shared_memory
+import numpy as np
+from scipy import sparse
+
+CSR_ARRAYS = ("indptr", "indices", "data")
+
+
+def share_csr(adjacency):
+    """
+    Copies the arrays of a CSR matrix into shared memory blocks.
+    Returns (blocks, spec): the SharedMemory handles (the caller releases them with release_blocks)
+    and a picklable spec {array name: (block name, length, dtype)} for attach_csr.
+    """
+    adjacency = sparse.csr_matrix(adjacency)
+    blocks, spec = [], {"shape": adjacency.shape}
+    for name in CSR_ARRAYS:
+        array = np.ascontiguousarray(getattr(adjacency, name))
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, dtype=array.dtype, buffer=block.buf)[:] = array
+        blocks.append(block)
+        spec[name] = (block.name, len(array), array.dtype.str)
+    return blocks, spec
+
+
+def attach_csr(spec):
+    """
+    Rebuilds a read-only CSR matrix on top of the shared memory blocks described by spec (no copy).
+    Returns (adjacency, blocks); the blocks must stay referenced while the matrix is in use.
+    """
+    blocks, arrays = [], {}
+    for name in CSR_ARRAYS:
+        block_name, length, dtype = spec[name]
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray((length,), dtype=dtype, buffer=block.buf)
+        array.flags.writeable = False
+        blocks.append(block)
+        arrays[name] = array
+    adjacency = sparse.csr_matrix((arrays["data"], arrays["indices"], arrays["indptr"]), shape=spec["shape"], copy=False)
+    return adjacency, blocks
+
+
+def release_blocks(blocks):
+    for block in blocks:
+        block.close()
+        block.unlink()
@@ -0,0 +1,128 @@
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
+from sklearn.metrics.pairwise import euclidean_distances
+
+DEFAULT_MEMORY_BUDGET_MB = 256
+
+
+def rows_per_tile(n_rows, n_cols, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, bytes_per_cell=8 + 1):
+    """
+    Number of rows of an n_rows x n_cols tile that fit in the memory budget at bytes_per_cell bytes
+    per tile cell. The default covers a float64 similarity block plus a boolean mask of the same shape.
+    """
+    bytes_per_row = max(n_cols, 1) * bytes_per_cell
+    return int(max(1, min(n_rows, memory_budget_mb * 1024 ** 2 // bytes_per_row)))
+
+
+def edges_from_tiles(tiles, shape):
+    """
+    Assembles the (rows, cols, weights) edge arrays kept from each tile into one COO matrix.
+    """
+    if not tiles:
+        return sparse.coo_matrix(shape)
+    rows, cols, weights = (np.concatenate(parts) for parts in zip(*tiles))
+    return sparse.coo_matrix((weights, (rows, cols)), shape=shape)
+
+
+def max_pairwise_distance(X, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Exact maximum euclidean distance between any two rows of X without building the n x n matrix.
+    Rows are visited from the farthest to the closest to the centroid; by the triangle inequality
+    dist(i, j) <= radius_i + radius_j, so the pass stops as soon as no remaining row can beat the
+    current maximum. For typical data only the first tile or two are ever computed.
+    """
+    n = X.shape[0]
+    if n < 2:
+        return 0.0
+    radii = np.linalg.norm(X - X.mean(axis=0), axis=1)
+    order = np.argsort(-radii)
+    max_radius = radii[order[0]]
+    step = rows_per_tile(n, n, memory_budget_mb)
+    max_dist = 0.0
+    for start in range(0, n, step):
+        if radii[order[start]] + max_radius <= max_dist:
+            break
+        tile = euclidean_distances(X[order[start:start + step]], X)
+        max_dist = max(max_dist, float(tile.max()))
+    return max_dist
+
+
+def similarity_edges(X, similarity_type, threshold, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB, max_dist=None):
+    """
+    Computes the normalized similarity between all rows of X in row tiles that fit in
+    memory_budget_mb, thresholds each tile in place and keeps only the surviving edges.
+    Returns the upper-triangular COO edge set (no self-loops) of all pairs with similarity >= threshold
+    without ever holding the dense n x n matrix.
+    similarity_type: "cosine" -> (cos + 1) / 2, "euclidean" -> 1 - dist / max_dist
+    max_dist: euclidean normalizer; computed from X when not given
+    """
+    X = np.asarray(X, dtype=np.float64)
+    n = X.shape[0]
+
+    if similarity_type == "cosine":
+        X_unit = normalize(X)
+    elif similarity_type == "euclidean":
+        if max_dist is None:
+            max_dist = max_pairwise_distance(X, memory_budget_mb)
+    else:
+        raise ValueError(f"Unknown similarity type: {similarity_type}")
+
+    tiles = []
+    start = 0
+    while start < n:
+        # Only the upper triangle is needed, so tile rows [start, stop) against columns [start, n)
+        stop = min(n, start + rows_per_tile(n - start, n - start, memory_budget_mb))
+        if similarity_type == "cosine":
+            # Cosine similarity ranges from -1 to 1, normalize to [0,1]: (sim + 1) / 2
+            tile = X_unit[start:stop] @ X_unit[start:].T
+            tile += 1
+            tile /= 2
+        else:
+            # Invert and normalize distances: 0 distance -> 1, max distance -> 0
+            tile = euclidean_distances(X[start:stop], X[start:])
+            if max_dist > 0:
+                tile /= max_dist
+            np.subtract(1, tile, out=tile)
+
+        mask = tile >= threshold
+        # Drop the diagonal and the lower triangle inside the tile
+        tile_rows, tile_cols = np.nonzero(np.triu(mask, k=1))
+        tiles.append((tile_rows + start, tile_cols + start, tile[tile_rows, tile_cols]))
+        start = stop
+
+    return edges_from_tiles(tiles, shape=(n, n))
+
+
+def cross_similarity_edges(A, B, similarity_type, threshold, max_dist=None, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Thresholded similarity between every row of A and every row of B, computed in row tiles of A.
+    Returns a len(A) x len(B) COO matrix of the surviving pairs.
+    For "euclidean", max_dist must be given so that A-B similarities are normalized like the original graph.
+    """
+    A = np.asarray(A, dtype=np.float64)
+    B = np.asarray(B, dtype=np.float64)
+    if similarity_type == "cosine":
+        A, B = normalize(A), normalize(B)
+    elif similarity_type == "euclidean":
+        if max_dist is None:
+            raise ValueError("max_dist is required for euclidean cross similarity")
+    else:
+        raise ValueError(f"Unknown similarity type: {similarity_type}")
+
+    tiles = []
+    step = rows_per_tile(A.shape[0], B.shape[0], memory_budget_mb)
+    for start in range(0, A.shape[0], step):
+        if similarity_type == "cosine":
+            tile = A[start:start + step] @ B.T
+            tile += 1
+            tile /= 2
+        else:
+            tile = euclidean_distances(A[start:start + step], B)
+            if max_dist > 0:
+                tile /= max_dist
+            np.subtract(1, tile, out=tile)
+        tile_rows, tile_cols = np.nonzero(tile >= threshold)
+        tiles.append((tile_rows + start, tile_cols, tile[tile_rows, tile_cols]))
+
+    return edges_from_tiles(tiles, shape=(A.shape[0], B.shape[0]))
@@ -0,0 +1,71 @@
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from utils.shared_graph import share_csr, attach_csr, release_blocks
+from utils.w_slpa import slpa_label_counts, communities_from_counts
+
+# Graph arrays attached from shared memory plus the SLPA settings, set once per worker process
+# by init_ensemble_worker
+_shared = {}
+
+
+def init_ensemble_worker(spec, node_ids, slpa_params):
+    adjacency, blocks = attach_csr(spec)
+    _shared.update(adjacency=adjacency, blocks=blocks, node_ids=node_ids, slpa_params=slpa_params)
+
+
+def run_ensemble_member(seed):
+    """
+    Runs one seeded SLPA on the shared graph with its own random generator.
+    Returns (seed, communities, num_iterations).
+    """
+    params = dict(_shared["slpa_params"])
+    r = params.pop("r")
+    counts, num_iterations = slpa_label_counts(_shared["adjacency"], seed=seed, **params)
+    return seed, communities_from_counts(counts, r, _shared["node_ids"]), num_iterations
+
+
+def run_subgraph_member(positions, seed):
+    """
+    Runs one seeded SLPA on the subgraph induced by the node positions, sliced from the shared CSR
+    arrays. Returns its communities as lists of node ids.
+    """
+    params = dict(_shared["slpa_params"])
+    r = params.pop("r")
+    subgraph = _shared["adjacency"][positions][:, positions]
+    counts, _ = slpa_label_counts(subgraph, seed=seed, **params)
+    return communities_from_counts(counts, r, _shared["node_ids"][positions])
+
+
+def slpa_on_subgraphs(adjacency, node_ids, groups, seeds, max_workers=None, r=0.1, **slpa_params):
+    """
+    Runs weighted SLPA independently on the subgraph of every group of node positions, in a process
+    pool over the shared CSR arrays (see slpa_ensemble). seeds[i] seeds the run of groups[i].
+    Large groups are submitted first to balance the workers.
+    Returns one list of communities per group, in the order of groups.
+    """
+    blocks, spec = share_csr(adjacency)
+    try:
+        init_args = (spec, np.asarray(node_ids), dict(slpa_params, r=r))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_ensemble_worker, initargs=init_args) as executor:
+            order = sorted(range(len(groups)), key=lambda idx: -len(groups[idx]))
+            futures = {idx: executor.submit(run_subgraph_member, groups[idx], seeds[idx]) for idx in order}
+            return [futures[idx].result() for idx in range(len(groups))]
+    finally:
+        release_blocks(blocks)
+
+
+def slpa_ensemble(adjacency, node_ids, seeds, max_workers=None, r=0.1, **slpa_params):
+    """
+    Runs weighted SLPA once per seed in a process pool. The CSR arrays are placed in shared memory
+    once and attached read-only by every worker, and each run draws from np.random.default_rng(seed),
+    so results do not depend on which worker runs which seed or in what order.
+    slpa_params are passed on to slpa_label_counts (t, mode, backend, tol, patience, criterion).
+    Returns [(seed, communities, num_iterations)] in the order of seeds.
+    """
+    blocks, spec = share_csr(adjacency)
+    try:
+        init_args = (spec, np.asarray(node_ids), dict(slpa_params, r=r))
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=init_ensemble_worker, initargs=init_args) as executor:
+            return list(executor.map(run_ensemble_member, seeds))
+    finally:
+        release_blocks(blocks)
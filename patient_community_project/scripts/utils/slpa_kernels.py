@@ -0,0 +1,77 @@
+import numpy as np
+
+# Numba is optional: without it the NumPy round functions below are used instead
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+KERNEL_BACKENDS = ("auto", "numba", "numpy")
+
+# The round functions get their random numbers from the caller (listener order plus one uniform
+# per directed edge), so both backends consume the same draws and seeded runs give identical
+# results.
+
+
+def slpa_async_round_numpy(indptr, indices, weights, order, draws, memory, memory_len, scores):
+    """
+    One asynchronous SLPA iteration: listeners in `order` each sample one label per neighbour
+    (label index int(draw * memory length)) and append the label with the largest total weight,
+    ties going to the label heard first. `scores` is a zeroed scratch array of length n.
+    """
+    for listener in order.tolist():
+        start, stop = indptr[listener], indptr[listener + 1]
+        if start == stop:
+            continue
+        speakers = indices[start:stop]
+        labels = memory[speakers, (draws[start:stop] * memory_len[speakers]).astype(np.int64)]
+        # Scatter-add the votes into the scratch array and reset only the touched entries
+        np.add.at(scores, labels, weights[start:stop])
+        selected_label = labels[np.argmax(scores[labels])]
+        scores[labels] = 0.0
+        memory[listener, memory_len[listener]] = selected_label
+        memory_len[listener] += 1
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True)
+    def slpa_async_round_numba(indptr, indices, weights, order, draws, memory, memory_len, scores):
+        heard = np.empty(np.max(indptr[1:] - indptr[:-1]) if len(order) else 0, dtype=memory.dtype)
+        for listener in order:
+            start, stop = indptr[listener], indptr[listener + 1]
+            if start == stop:
+                continue
+            for j in range(start, stop):
+                speaker = indices[j]
+                label = memory[speaker, int(draws[j] * memory_len[speaker])]
+                heard[j - start] = label
+                scores[label] += weights[j]
+            selected_label = heard[0]
+            best = scores[selected_label]
+            for j in range(1, stop - start):
+                if scores[heard[j]] > best:
+                    best = scores[heard[j]]
+                    selected_label = heard[j]
+            for j in range(stop - start):
+                scores[heard[j]] = 0.0
+            memory[listener, memory_len[listener]] = selected_label
+            memory_len[listener] += 1
+
+
+def resolve_backend(backend="auto"):
+    """
+    Maps "auto" to "numba" when Numba is installed and to "numpy" otherwise.
+    """
+    if backend not in KERNEL_BACKENDS:
+        raise ValueError(f"Unknown kernel backend: {backend}")
+    if backend == "auto":
+        return "numba" if NUMBA_AVAILABLE else "numpy"
+    if backend == "numba" and not NUMBA_AVAILABLE:
+        raise ImportError("The numba backend was requested but numba is not installed")
+    return backend
+
+
+def slpa_round_kernel(backend="auto"):
+    return slpa_async_round_numba if resolve_backend(backend) == "numba" else slpa_async_round_numpy
+
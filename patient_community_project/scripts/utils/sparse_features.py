@@ -0,0 +1,203 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.preprocessing import normalize, StandardScaler
+from utils.similarity import rows_per_tile, edges_from_tiles, DEFAULT_MEMORY_BUDGET_MB
+
+SPARSE_SIMILARITY_TYPES = ("cosine", "jaccard", "gower")
+
+# Memory per tile cell for the dense tiles below: a sparse product can fill every cell of its tile
+# at 12 bytes (float64 value + int32 column), on top of the float64 blocks and the threshold mask
+SPARSE_PRODUCT_BYTES = 12
+GOWER_BYTES_PER_CELL = 5 * 8 + SPARSE_PRODUCT_BYTES + 2  # numerator, denominator, tile, 2 temporaries
+MIXED_COSINE_BYTES_PER_CELL = 8 + SPARSE_PRODUCT_BYTES + 2  # tile
+
+
+def one_hot_sparse(df, columns):
+    """
+    One-hot encodes categorical columns as a CSR matrix; missing values get no entry.
+    Returns (matrix, valid) where valid is an n x len(columns) CSR indicator of non-missing values.
+    """
+    n = len(df)
+    blocks, valid_rows, valid_cols = [], [], []
+    for col_idx, col in enumerate(columns):
+        codes, categories = pd.factorize(df[col])
+        rows = np.flatnonzero(codes >= 0)
+        blocks.append(sparse.csr_matrix((np.ones(len(rows)), (rows, codes[rows])), shape=(n, len(categories))))
+        valid_rows.append(rows)
+        valid_cols.append(np.full(len(rows), col_idx))
+    if not blocks:
+        return sparse.csr_matrix((n, 0)), sparse.csr_matrix((n, 0))
+    rows = np.concatenate(valid_rows)
+    valid = sparse.csr_matrix((np.ones(len(rows)), (rows, np.concatenate(valid_cols))), shape=(n, len(columns)))
+    return sparse.hstack(blocks, format="csr"), valid
+
+
+def mutation_indicators(patient_ids, mutation_df, gene_col="hugoGeneSymbol"):
+    """
+    Binary patient x gene CSR matrix (1 if the patient has any mutation in the gene), rows in patient_ids order.
+    """
+    rows = pd.Index(patient_ids).get_indexer(mutation_df['patientId'])
+    genes = mutation_df[gene_col].to_numpy()
+    keep = (rows >= 0) & pd.notnull(genes)
+    codes, unique_genes = pd.factorize(genes[keep])
+    indicators = sparse.csr_matrix(
+        (np.ones(len(codes)), (rows[keep], codes)), shape=(len(patient_ids), len(unique_genes))
+    )
+    # Several mutations in the same gene collapse to one indicator
+    indicators.data[:] = 1.0
+    return indicators
+
+
+def sparse_similarity_edges(F, similarity_type, threshold, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Thresholded cosine or Jaccard similarity between the rows of a sparse feature matrix, computed
+    with sparse products in row tiles. Only pairs that share at least one non-zero feature are ever
+    materialized, so the cost follows the number of overlapping non-zeros rather than n^2.
+    "cosine"  -> (cos + 1) / 2, pairs without overlap are 0.5
+    "jaccard" -> |a & b| / |a | b| on the binarized features, pairs without overlap are 0
+    Returns the same upper-triangular COO edge set as similarity_edges.
+    """
+    F = sparse.csr_matrix(F, dtype=np.float64)
+    n = F.shape[0]
+    if similarity_type == "cosine":
+        F = normalize(F)
+        no_overlap_similarity = 0.5
+    elif similarity_type == "jaccard":
+        F = (F != 0).astype(np.float64)
+        sizes = np.asarray(F.sum(axis=1)).ravel()
+        no_overlap_similarity = 0.0
+    else:
+        raise ValueError(f"Unknown sparse similarity type: {similarity_type}")
+    if threshold <= no_overlap_similarity:
+        raise ValueError(
+            f"{similarity_type} threshold must be above {no_overlap_similarity}, "
+            "otherwise patients without shared features would be connected"
+        )
+
+    tiles = []
+    start = 0
+    while start < n:
+        stop = min(n, start + rows_per_tile(n - start, n - start, memory_budget_mb))
+        product = (F[start:stop] @ F[start:].T).tocoo()
+        # Keep the strict upper triangle (tile-relative column > row)
+        upper = product.col > product.row
+        tile_rows, tile_cols, values = product.row[upper], product.col[upper], product.data[upper]
+        if similarity_type == "cosine":
+            sim = (values + 1) / 2
+        else:
+            sim = values / (sizes[tile_rows + start] + sizes[tile_cols + start] - values)
+        keep = sim >= threshold
+        tiles.append((tile_rows[keep] + start, tile_cols[keep] + start, sim[keep]))
+        start = stop
+
+    return edges_from_tiles(tiles, shape=(n, n))
+
+
+def add_sparse(block, product):
+    """
+    Adds a sparse matrix into a dense block of the same shape in place, touching only its stored entries.
+    """
+    product = sparse.coo_matrix(product)
+    block[product.row, product.col] += product.data
+
+
+def gower_similarity_edges(X_numeric, C, C_valid, M, threshold, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Thresholded Gower-style similarity for mixed profiles, computed in row tiles:
+        numeric columns     -> 1 - |x_i - x_j| / range
+        categorical columns -> 1 if equal, skipped when either value is missing
+        mutation indicators -> asymmetric binary, only genes mutated in at least one of the two patients count
+    similarity = (sum of numeric similarities + categorical matches + shared mutations)
+                 / (numeric columns + categorical columns observed in both + genes mutated in either)
+    The categorical and mutation counts come from sparse products (C C^T, C_valid C_valid^T, M M^T),
+    added into the dense tiles entry by entry rather than densified.
+    """
+    X_numeric = np.asarray(X_numeric, dtype=np.float64)
+    C, C_valid, M = sparse.csr_matrix(C), sparse.csr_matrix(C_valid), sparse.csr_matrix(M)
+    n, k = X_numeric.shape
+    ranges = X_numeric.max(axis=0) - X_numeric.min(axis=0) if n else np.zeros(k)
+    mutation_counts = np.asarray(M.sum(axis=1)).ravel()
+
+    tiles = []
+    start = 0
+    while start < n:
+        stop = min(n, start + rows_per_tile(n - start, n - start, memory_budget_mb, GOWER_BYTES_PER_CELL))
+        numerator = np.zeros((stop - start, n - start))
+        for col in range(k):
+            if ranges[col] > 0:
+                numerator += 1 - np.abs(X_numeric[start:stop, col, None] - X_numeric[None, start:, col]) / ranges[col]
+            else:
+                numerator += 1
+        add_sparse(numerator, C[start:stop] @ C[start:].T)
+        shared_mutations = M[start:stop] @ M[start:].T
+        add_sparse(numerator, shared_mutations)
+
+        denominator = k + mutation_counts[start:stop, None] + mutation_counts[None, start:]
+        add_sparse(denominator, C_valid[start:stop] @ C_valid[start:].T)
+        add_sparse(denominator, -shared_mutations)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            tile = np.where(denominator > 0, numerator / denominator, 0.0)
+
+        tile_rows, tile_cols = np.nonzero(np.triu(tile >= threshold, k=1))
+        tiles.append((tile_rows + start, tile_cols + start, tile[tile_rows, tile_cols]))
+        start = stop
+
+    return edges_from_tiles(tiles, shape=(n, n))
+
+
+def mixed_cosine_edges(X_dense, S, threshold, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Thresholded (cos + 1) / 2 similarity over a few dense columns stacked with a wide sparse block.
+    The dot product is split into a dense part (X_dense X_dense^T, a handful of columns) and a sparse
+    part (S S^T, only overlapping non-zeros), so the wide block is never densified.
+    """
+    X_dense = np.asarray(X_dense, dtype=np.float64)
+    S = sparse.csr_matrix(S, dtype=np.float64)
+    n = X_dense.shape[0]
+    norms = np.sqrt((X_dense ** 2).sum(axis=1) + np.asarray(S.multiply(S).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    X_dense = X_dense / norms[:, None]
+    S = sparse.diags(1 / norms) @ S
+
+    tiles = []
+    start = 0
+    while start < n:
+        stop = min(n, start + rows_per_tile(n - start, n - start, memory_budget_mb, MIXED_COSINE_BYTES_PER_CELL))
+        tile = X_dense[start:stop] @ X_dense[start:].T
+        add_sparse(tile, S[start:stop] @ S[start:].T)
+        tile += 1
+        tile /= 2
+
+        tile_rows, tile_cols = np.nonzero(np.triu(tile >= threshold, k=1))
+        tiles.append((tile_rows + start, tile_cols + start, tile[tile_rows, tile_cols]))
+        start = stop
+
+    return edges_from_tiles(tiles, shape=(n, n))
+
+
+def mixed_feature_edges(response_df, patient_df, numeric_features, categorical_features, mutation_df,
+                        similarity_type, threshold, memory_budget_mb=DEFAULT_MEMORY_BUDGET_MB):
+    """
+    Builds edges from numeric response features plus sparse categorical and mutation features.
+    response_df is the prepared numeric frame (its index selects the matching patient_df rows);
+    mutation_df may be None to leave mutations out.
+    cosine:  standardized numeric columns stacked with one-hot and mutation indicators (see mixed_cosine_edges)
+    jaccard: one-hot and mutation indicators only (numeric columns are not binary)
+    gower:   raw numeric columns plus categorical matches and shared mutations
+    """
+    if similarity_type not in SPARSE_SIMILARITY_TYPES:
+        raise ValueError(f"Unknown sparse similarity type: {similarity_type}")
+    categorical_df = patient_df.loc[response_df.index, categorical_features]
+    C, C_valid = one_hot_sparse(categorical_df, categorical_features)
+    if mutation_df is not None:
+        M = mutation_indicators(response_df['patientId'].to_numpy(), mutation_df)
+    else:
+        M = sparse.csr_matrix((len(response_df), 0))
+
+    if similarity_type == "gower":
+        return gower_similarity_edges(response_df[numeric_features], C, C_valid, M, threshold, memory_budget_mb)
+    if similarity_type == "cosine":
+        X = StandardScaler().fit_transform(response_df[numeric_features])
+        return mixed_cosine_edges(X, sparse.hstack([C, M], format="csr"), threshold, memory_budget_mb)
+    return sparse_similarity_edges(sparse.hstack([C, M], format="csr"), "jaccard", threshold, memory_budget_mb)
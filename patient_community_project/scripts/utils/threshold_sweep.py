@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+def sort_edges_by_weight(edges):
+    """
+    Returns (rows, cols, weights) of an edge set sorted by decreasing weight.
+    Every threshold graph is then a prefix of these arrays.
+    """
+    edges = sparse.coo_matrix(edges)
+    order = np.argsort(-edges.data, kind="stable")
+    return edges.row[order], edges.col[order], edges.data[order]
+
+
+def threshold_sweep(edges, thresholds):
+    """
+    Evaluates several similarity thresholds from one edge set built at the lowest threshold.
+    Thresholded graphs are nested, so the graph for threshold t is the prefix of the weight-sorted
+    edges with weight >= t.
+    Returns:
+        summary_df: one row per threshold with node/edge counts, mean degree, density and isolated nodes
+        edge_sets: dict threshold -> (rows, cols, weights), zero-copy views into the sorted arrays
+    """
+    n = edges.shape[0]
+    rows, cols, weights = sort_edges_by_weight(edges)
+    m = len(weights)
+
+    # Position of each node's strongest edge: the node is connected in every prefix longer than it
+    first_edge = np.full(n, m)
+    np.minimum.at(first_edge, rows, np.arange(m))
+    np.minimum.at(first_edge, cols, np.arange(m))
+    first_edge.sort()
+
+    summary = []
+    edge_sets = {}
+    for threshold in sorted(thresholds, reverse=True):
+        # weights are sorted descending, so count the prefix with weight >= threshold on the negated array
+        num_edges = int(np.searchsorted(-weights, -threshold, side="right"))
+        connected = int(np.searchsorted(first_edge, num_edges, side="left"))
+        edge_sets[threshold] = (rows[:num_edges], cols[:num_edges], weights[:num_edges])
+        summary.append({
+            "threshold": threshold,
+            "num_nodes": n,
+            "num_edges": num_edges,
+            "avg_degree": 2 * num_edges / n if n > 0 else 0.0,
+            "density": 2 * num_edges / (n * (n - 1)) if n > 1 else 0.0,
+            "num_isolated_nodes": n - connected,
+        })
+    return pd.DataFrame(summary), edge_sets
@@ -1,50 +1,372 @@
-import random
-from collections import defaultdict
+import os
+import numpy as np
+from scipy import sparse
 import matplotlib.pyplot as plt
+from utils.slpa_kernels import slpa_round_kernel
 
-# Custom SLPA with weighted label propagation
-def weighted_slpa(graph, t=20, r=0.1, plot_freq_dist=False, freq_dist_path=None):
-    memory = {node: [node] for node in graph.nodes()}
-    for t in range(t):
-        nodes = list(graph.nodes())
-        random.shuffle(nodes)
-        for listener in nodes:
-            label_counts = defaultdict(float)
-            for neighbor in graph.neighbors(listener):
-                speaker_memory = memory[neighbor]
-                label = random.choice(speaker_memory)
-                weight = graph[listener][neighbor].get('weight', 0.0)
-                label_counts[label] += weight
-            if label_counts:
-                selected_label = max(label_counts.items(), key=lambda x: x[1])[0]
-                memory[listener].append(selected_label)
-    # Post-processing
-    communities = defaultdict(list)
-    all_freqs = []  # For plotting frequency distribution
-    for node, labels in memory.items():
-        label_freq = defaultdict(int)
-        for label in labels:
-            label_freq[label] += 1
-        total = len(labels)
-        for label, count in label_freq.items():
-            freq = count / total
-            all_freqs.append(freq)
-            if freq >= r:
-                communities[label].append(node)
-    print(all_freqs)
-    if plot_freq_dist:
-        plt.figure(figsize=(8, 4))
-        plt.hist(all_freqs, bins=50, color='skyblue', edgecolor='black')
-        plt.title('Distribution of Label Frequencies in Node Memories')
-        plt.xlabel('Frequency (count/total)')
-        plt.ylabel('Number of (node, label) pairs')
-        plt.axvline(r, color='red', linestyle='--', label=f'r = {r}')
-        plt.legend()
-        plt.tight_layout()
-        if freq_dist_path:
-            plt.savefig(freq_dist_path)
-            print(f"Frequency distribution plot saved to {freq_dist_path}")
+# SLPA label memories (node x label counts) saved next to community_assignments.csv
+LABEL_COUNTS_FILENAME = "slpa_label_counts.npz"
+
+
+def plot_label_frequencies(all_freqs, r, freq_dist_path=None):
+    plt.figure(figsize=(8, 4))
+    plt.hist(all_freqs, bins=50, color='skyblue', edgecolor='black')
+    plt.title('Distribution of Label Frequencies in Node Memories')
+    plt.xlabel('Frequency (count/total)')
+    plt.ylabel('Number of (node, label) pairs')
+    plt.axvline(r, color='red', linestyle='--', label=f'r = {r}')
+    plt.legend()
+    plt.tight_layout()
+    if freq_dist_path:
+        plt.savefig(freq_dist_path)
+        print(f"Frequency distribution plot saved to {freq_dist_path}")
+    else:
+        plt.show()
+    plt.close()
+
+
+def normalize_edge_weights(adjacency):
+    """
+    Returns a copy of a CSR adjacency matrix with edge weights min-max normalized to [0, 1].
+    """
+    adjacency = adjacency.copy()
+    if adjacency.nnz:
+        min_w, max_w = adjacency.data.min(), adjacency.data.max()
+        adjacency.data = (adjacency.data - min_w) / (max_w - min_w + 1e-9)
+    return adjacency
+
+
+SLPA_MODES = ("async", "sync", "semi_sync")
+CONVERGENCE_CRITERIA = ("dominant", "l1")
+
+
+def edge_rows(indptr):
+    """
+    Listener (row) index of every stored entry of a CSR matrix.
+    """
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+def color_classes(indptr, indices, rng):
+    """
+    Splits the nodes into independent sets (no two nodes in a class are adjacent) with
+    Jones-Plassmann colouring: each round, every uncoloured node whose random priority beats all
+    of its uncoloured neighbours joins the next class.
+    Returns a list of node index arrays.
+    """
+    n = len(indptr) - 1
+    priorities = rng.permutation(n)
+    rows = edge_rows(indptr)
+    # Self-loops are ignored: a node can never beat its own priority
+    off_diagonal = indices != rows
+    rows, indices = rows[off_diagonal], indices[off_diagonal]
+    remaining = np.ones(n, dtype=bool)
+    classes = []
+    while remaining.any():
+        neighbour_priorities = np.where(remaining[indices], priorities[indices], -1)
+        max_neighbour = np.full(n, -1)
+        np.maximum.at(max_neighbour, rows, neighbour_priorities)
+        chosen = remaining & (priorities > max_neighbour)
+        if not chosen.any():
+            raise RuntimeError("Colouring round assigned no node")
+        classes.append(np.flatnonzero(chosen))
+        remaining[chosen] = False
+    return classes
+
+
+def plurality_labels(listeners, labels, weights, n):
+    """
+    Weighted plurality vote for many listeners at once: one (listener, label, weight) triple per
+    heard label, listeners sorted ascending. The votes are laid out as a listener x label CSR
+    matrix so that grouping repeated labels only sorts within each listener. Ties go to the
+    smallest label.
+    Returns (listeners, winning labels) for every listener that heard at least one label.
+    """
+    starts = np.r_[0, np.flatnonzero(np.diff(listeners)) + 1]
+    votes = sparse.csr_matrix((weights, labels, np.r_[starts, len(listeners)]), shape=(len(starts), n), copy=True)
+    # sort_indices keeps zero weights (sum_duplicates would drop them)
+    votes.sort_indices()
+    vote_rows = np.repeat(np.arange(len(starts)), np.diff(votes.indptr))
+    pair_starts = np.flatnonzero(np.r_[True, (np.diff(vote_rows) != 0) | (np.diff(votes.indices) != 0)])
+    pair_rows, pair_labels = vote_rows[pair_starts], votes.indices[pair_starts]
+    scores = np.add.reduceat(votes.data, pair_starts)
+
+    row_starts = np.flatnonzero(np.r_[True, np.diff(pair_rows) != 0])
+    row_max = np.maximum.reduceat(scores, row_starts)
+    candidates = np.flatnonzero(scores == row_max[pair_rows])
+    first = candidates[np.r_[True, np.diff(pair_rows[candidates]) != 0]]
+    return listeners[starts], pair_labels[first]
+
+
+def hash_slots(table_keys, keys):
+    """
+    Slot of every (distinct, non-negative) key in an open-addressing hash table with linear probing,
+    table_keys holding -1 in empty slots and a power-of-two length. Missing keys are written into
+    the empty slot they reach. Returns (slots, new), new marking the keys just inserted.
+    """
+    mask = len(table_keys) - 1
+    bits = np.uint64(64 - mask.bit_length())
+    # Fibonacci hashing: the top bits of key x (2^64 / golden ratio)
+    slots = ((keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) >> bits).astype(np.int64)
+    new = np.zeros(len(keys), dtype=bool)
+    pending = np.arange(len(keys))
+    while len(pending):
+        pending_slots = slots[pending]
+        stored = table_keys[pending_slots]
+        resolved = stored == keys[pending]
+        # Keys reaching the same empty slot in this round: the first one claims it, the others probe on
+        empty = np.flatnonzero(stored == -1)
+        claimed, first = np.unique(pending_slots[empty], return_index=True)
+        winners = empty[first]
+        table_keys[claimed] = keys[pending[winners]]
+        new[pending[winners]] = True
+        resolved[winners] = True
+        occupied = ~resolved & (stored != -1)
+        slots[pending[occupied]] = (pending_slots[occupied] + 1) & mask
+        pending = pending[~resolved]
+    return slots, new
+
+
+def convergence_check(memory, memory_len, active, tol, patience=3, criterion="dominant"):
+    """
+    Returns a function to call after every SLPA iteration; it returns True once the change between
+    successive label distributions has stayed below tol for `patience` iterations in a row.
+    Every node in `active` (the non-isolated nodes) has just appended one label x to a memory of
+    length L, in which x already appeared c times. Averaged over active nodes:
+    dominant: fraction of nodes whose most frequent label changed (ties keep the old one)
+    l1:       L1 distance between the old and new label frequencies, 2 (L - c) / (L (L + 1))
+    c comes from running (node, label) counts kept in a hash table (see hash_slots) and updated
+    with the appended labels only, so a check costs O(n) whatever the memory length.
+    """
+    if criterion not in CONVERGENCE_CRITERIA:
+        raise ValueError(f"Unknown convergence criterion: {criterion}")
+    n = len(memory_len)
+    dominant = np.arange(n)[active]
+    dominant_count = np.ones(len(active), dtype=np.int64)
+    streak = 0
+
+    # Every active node starts with its own label once; the table is kept at most half full
+    capacity = 1 << max(4, int(4 * len(active)).bit_length())
+    table_keys = np.full(capacity, -1, dtype=np.int64)
+    table_counts = np.zeros(capacity, dtype=np.int64)
+    slots, _ = hash_slots(table_keys, active * n + dominant)
+    table_counts[slots] = 1
+    num_keys = len(active)
+
+    def check():
+        nonlocal streak, table_keys, table_counts, num_keys
+        if len(active) == 0:
+            return True
+        if 2 * (num_keys + len(active)) > len(table_keys):
+            # Double the table and reinsert the stored (node, label) counts
+            stored = np.flatnonzero(table_keys >= 0)
+            old_keys, old_counts = table_keys[stored], table_counts[stored]
+            table_keys = np.full(2 * len(table_keys), -1, dtype=np.int64)
+            table_counts = np.zeros(len(table_keys), dtype=np.int64)
+            slots, _ = hash_slots(table_keys, old_keys)
+            table_counts[slots] = old_counts
+
+        lengths = memory_len[active] - 1
+        new_labels = memory[active, lengths]
+        slots, new = hash_slots(table_keys, active * n + new_labels)
+        num_keys += int(new.sum())
+        previous_count = table_counts[slots].copy()
+        table_counts[slots] += 1
+
+        if criterion == "dominant":
+            overtakes = previous_count + 1 > dominant_count
+            changed = overtakes & (new_labels != dominant)
+            dominant[overtakes] = new_labels[overtakes]
+            dominant_count[overtakes] = previous_count[overtakes] + 1
+            distance = changed.mean()
         else:
-            plt.show()
-        plt.close()
-    return list(communities.values())
\ No newline at end of file
+            distance = np.mean(2 * (lengths - previous_count) / (lengths * (lengths + 1)))
+
+        streak = streak + 1 if distance < tol else 0
+        return streak >= patience
+
+    return check
+
+
+def slpa_propagate(indptr, indices, weights, t, rng, mode="async", backend="auto",
+                   tol=None, patience=3, criterion="dominant"):
+    """
+    Weighted SLPA speak/listen loop over CSR arrays with integer labels 0..n-1.
+    Memory is a preallocated n x (t + 1) label matrix; memory_len[i] is how many labels node i holds
+    (isolated nodes never hear anything). Each iteration draws one uniform number per directed edge
+    up front, used to sample one label from each speaker's memory.
+    async:     listeners update one by one in shuffled order (ties go to the label heard first),
+               using the compiled kernel when backend resolves to "numba" (see slpa_kernels)
+    sync:      every listener samples from the previous iteration's memory and all votes are
+               resolved in one batched scatter-add (ties go to the smallest label)
+    semi_sync: as sync, but one colour class (independent set) at a time in shuffled class order,
+               so each class hears the labels the earlier classes just picked
+    With tol set, t is only a cap: propagation stops early once the memories have converged
+    (see convergence_check). Stopping does not change the draws of the iterations that did run.
+    Returns (memory, memory_len, num_iterations), memory trimmed to num_iterations + 1 columns.
+    """
+    if mode not in SLPA_MODES:
+        raise ValueError(f"Unknown SLPA mode: {mode}")
+    n = len(indptr) - 1
+    memory = np.empty((n, t + 1), dtype=np.int64)
+    memory[:, 0] = np.arange(n)
+    memory_len = np.ones(n, dtype=np.int64)
+
+    if mode == "async":
+        round_kernel = slpa_round_kernel(backend)
+        scores = np.zeros(n)
+
+        def propagate_round():
+            order = rng.permutation(n)
+            draws = rng.random(len(indices))
+            round_kernel(indptr, indices, weights, order, draws, memory, memory_len, scores)
+    else:
+        rows = edge_rows(indptr)
+        classes = edge_classes(indptr, indices, rows, rng, mode)
+
+        def propagate_round():
+            batched_round(indices, weights, rows, classes, rng.random(len(indices)), rng, memory, memory_len)
+
+    converged = None
+    if tol is not None:
+        converged = convergence_check(memory, memory_len, np.flatnonzero(np.diff(indptr)), tol, patience, criterion)
+    num_iterations = 0
+    while num_iterations < t:
+        propagate_round()
+        num_iterations += 1
+        if converged is not None and converged():
+            break
+    return memory[:, :num_iterations + 1], memory_len, num_iterations
+
+
+def edge_classes(indptr, indices, rows, rng, mode):
+    """
+    Edge positions updated together by batched_round: all edges for sync, one group per colour
+    class for semi_sync. Positions stay in CSR order within each group.
+    """
+    if mode == "sync":
+        return [np.arange(len(indices))]
+    color = np.empty(len(indptr) - 1, dtype=np.int64)
+    node_classes = color_classes(indptr, indices, rng)
+    for idx, nodes in enumerate(node_classes):
+        color[nodes] = idx
+    edge_order = np.argsort(color[rows], kind="stable")
+    boundaries = np.searchsorted(color[rows][edge_order], np.arange(1, len(node_classes)))
+    return np.split(edge_order, boundaries)
+
+
+def batched_round(indices, weights, rows, classes, draws, rng, memory, memory_len):
+    """
+    One sync / semi_sync iteration of slpa_propagate: every listener in a class is updated with
+    one batched vote over the edges of the whole class, classes in shuffled order.
+    """
+    n = len(memory_len)
+    for class_idx in rng.permutation(len(classes)).tolist():
+        edges = classes[class_idx]
+        if len(edges) == 0:
+            continue
+        speakers = indices[edges]
+        labels = memory[speakers, (draws[edges] * memory_len[speakers]).astype(np.int64)]
+        # edges are in CSR order, so their listener rows are already sorted
+        listeners, selected = plurality_labels(rows[edges], labels, weights[edges], n)
+        memory[listeners, memory_len[listeners]] = selected
+        memory_len[listeners] += 1
+
+
+def label_counts(memory, memory_len):
+    """
+    Compacts SLPA memories into a sparse node x label count matrix (CSR, int32): entry (i, l) is how
+    many times node i holds label l. Row sums are the memory lengths.
+    """
+    n, width = memory.shape
+    valid = np.arange(width)[None, :] < memory_len[:, None]
+    rows = np.broadcast_to(np.arange(n)[:, None], memory.shape)[valid]
+    # Duplicate (node, label) entries are summed by the COO -> CSR conversion
+    return sparse.coo_matrix(
+        (np.ones(len(rows), dtype=np.int32), (rows, memory[valid])), shape=(n, n)
+    ).tocsr()
+
+
+def label_frequency_values(counts):
+    """
+    Frequency (count / memory length) of every stored (node, label) pair, in CSR order.
+    """
+    counts = sparse.csr_matrix(counts)
+    totals = np.asarray(counts.sum(axis=1)).ravel()
+    return counts.data / np.repeat(totals, np.diff(counts.indptr))
+
+
+def communities_from_counts(counts, r=0.1, node_ids=None):
+    """
+    SLPA post-processing: node i joins the community of label l when l makes up at least a
+    fraction r of its memory. Can be called again at any r without rerunning propagation.
+    Returns a list of communities (lists of node ids, positions 0..n-1 if node_ids is None).
+    """
+    counts = sparse.csr_matrix(counts)
+    keep = label_frequency_values(counts) >= r
+    nodes = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))[keep]
+    labels = counts.indices[keep]
+    if node_ids is not None:
+        nodes = np.asarray(node_ids)[nodes]
+    order = np.argsort(labels, kind="stable")
+    nodes, labels = nodes[order], labels[order]
+    boundaries = np.flatnonzero(np.diff(labels)) + 1
+    return [community.tolist() for community in np.split(nodes, boundaries)] if len(nodes) else []
+
+
+def save_label_counts(output_dir, counts, node_ids):
+    os.makedirs(output_dir, exist_ok=True)
+    counts = sparse.csr_matrix(counts)
+    np.savez_compressed(
+        os.path.join(output_dir, LABEL_COUNTS_FILENAME),
+        data=counts.data,
+        indices=counts.indices,
+        indptr=counts.indptr,
+        node_ids=np.asarray(node_ids),
+    )
+
+
+def load_label_counts(output_dir):
+    """
+    Returns (counts, node_ids) saved by save_label_counts, or None if output_dir has no counts.
+    """
+    path = os.path.join(output_dir, LABEL_COUNTS_FILENAME)
+    if not os.path.exists(path):
+        return None
+    stored = np.load(path)
+    n = len(stored["node_ids"])
+    counts = sparse.csr_matrix((stored["data"], stored["indices"], stored["indptr"]), shape=(n, n))
+    return counts, stored["node_ids"]
+
+
+def slpa_label_counts(adjacency, t=20, seed=None, mode="async", backend="auto", tol=None, patience=3,
+                      criterion="dominant"):
+    """
+    Runs weighted SLPA propagation on a CSR adjacency matrix (at most t iterations, fewer if tol is
+    set and the memories converge, see slpa_propagate).
+    Returns (counts, num_iterations) with counts the node x label count matrix (see label_counts);
+    labels are node positions 0..n-1.
+    """
+    adjacency = adjacency.tocsr()
+    rng = np.random.default_rng(seed)
+    memory, memory_len, num_iterations = slpa_propagate(
+        np.asarray(adjacency.indptr), np.asarray(adjacency.indices), np.asarray(adjacency.data, dtype=np.float64),
+        t, rng, mode, backend, tol, patience, criterion,
+    )
+    return label_counts(memory, memory_len), num_iterations
+
+
+def weighted_slpa_csr(adjacency, node_ids=None, t=20, r=0.1, seed=None, mode="async", backend="auto",
+                      tol=None, patience=3, criterion="dominant", plot_freq_dist=False, freq_dist_path=None):
+    """
+    Weighted SLPA on a CSR adjacency matrix with array-backed memory and a per-run NumPy random
+    generator: every listener appends the label with the largest total edge weight among one label
+    sampled from each neighbour's memory, and labels held with frequency >= r form the communities.
+    See slpa_propagate for the "sync" and "semi_sync" update modes, the async kernel backends and
+    early stopping.
+    Returns a list of communities (lists of node ids, positions 0..n-1 if node_ids is None).
+    """
+    counts, _ = slpa_label_counts(adjacency, t, seed, mode, backend, tol, patience, criterion)
+    if plot_freq_dist:
+        plot_label_frequencies(label_frequency_values(counts), r, freq_dist_path)
+    return communities_from_counts(counts, r, node_ids)
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts import their helpers as utils.<module>, as when run from patient_community_project
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "scripts"))
@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+from scipy import sparse
+from utils.w_slpa import slpa_propagate, normalize_edge_weights
+
+
+def random_graph(n, m, seed):
+    rng = np.random.default_rng(seed)
+    rows, cols = rng.integers(n, size=m), rng.integers(n, size=m)
+    upper = sparse.coo_matrix((rng.random(m), (rows, cols)), shape=(n, n))
+    adjacency = sparse.triu(upper + upper.T, k=1)
+    return normalize_edge_weights((adjacency + adjacency.T).tocsr())
+
+
+@pytest.mark.parametrize("seed", [42, 101, 202])
+@pytest.mark.parametrize("tol", [None, 0.01])
+def test_async_backends_give_identical_memories(seed, tol):
+    pytest.importorskip("numba")
+    adjacency = random_graph(300, 1200, seed)
+    runs = {
+        backend: slpa_propagate(
+            adjacency.indptr, adjacency.indices, adjacency.data, 20, np.random.default_rng(seed),
+            backend=backend, tol=tol,
+        )
+        for backend in ("numpy", "numba")
+    }
+    (memory_np, memory_len_np, iterations_np), (memory_nb, memory_len_nb, iterations_nb) = runs["numpy"], runs["numba"]
+    assert iterations_np == iterations_nb
+    assert np.array_equal(memory_len_np, memory_len_nb)
+    # Only the first memory_len entries of each row hold labels
+    valid = np.arange(memory_np.shape[1]) < memory_len_np[:, None]
+    assert np.array_equal(memory_np[valid], memory_nb[valid])
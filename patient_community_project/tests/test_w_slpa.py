@@ -0,0 +1,16 @@
+import numpy as np
+from utils.w_slpa import hash_slots
+
+
+def test_hash_slots_keep_one_slot_per_key():
+    rng = np.random.default_rng(0)
+    table_keys = np.full(1 << 12, -1, dtype=np.int64)
+    seen = {}
+    for _ in range(20):
+        keys = np.unique(rng.integers(0, 3000, size=80))
+        slots, new = hash_slots(table_keys, keys)
+        for key, slot, is_new in zip(keys.tolist(), slots.tolist(), new.tolist()):
+            assert is_new == (key not in seen)
+            assert seen.setdefault(key, slot) == slot
+    assert len(set(seen.values())) == len(seen)
+    assert np.array_equal(np.sort(table_keys[table_keys >= 0]), np.sort(list(seen)))
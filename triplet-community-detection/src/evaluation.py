@@ -1,23 +1,73 @@
-from cdlib import evaluation
-from cdlib.classes import NodeClustering
 from sklearn.metrics import normalized_mutual_info_score, adjusted_rand_score
+import networkx as nx
+import numpy as np
 import pandas as pd
 import os
+from scipy import sparse
+from array_lpa import graph_to_csr
+
+def partition_labels(nodes, communities):
+    """
+    Label array of a partition (list of lists of node ids), in the order of nodes; -1 for nodes in no community.
+    """
+    node_index = {node: idx for idx, node in enumerate(nodes)}
+    labels = np.full(len(nodes), -1)
+    for comm_id, comm in enumerate(communities):
+        labels[[node_index[node] for node in comm]] = comm_id
+    return labels
+
+def level_scores(adjacency, level_labels):
+    """
+    Newman-Girvan modularity and mean conductance of every row of a levels x nodes label array
+    (-1 for nodes outside any community at that level) on the unweighted CSR adjacency of
+    graph_to_csr, from one bincount pass over the edges. Values match cdlib's
+    newman_girvan_modularity and conductance when every node is assigned.
+    Returns (modularity, conductance, num_communities), one entry per level.
+    """
+    level_labels = np.atleast_2d(level_labels).astype(np.int64)
+    num_levels, _ = level_labels.shape
+    num_labels = int(level_labels.max()) + 1 if level_labels.size else 0
+    upper = sparse.triu(adjacency, k=0).tocoo()
+    num_edges = upper.nnz
+    if num_edges == 0:
+        raise ValueError("A graph without link has an undefined modularity")
+    # Self-loops add two to the degree, as in NetworkX
+    degrees = np.diff(adjacency.indptr) + (adjacency.diagonal() != 0)
+
+    offsets = np.arange(num_levels)[:, None] * num_labels
+    def count(bins, weights=None):
+        return np.bincount(bins, weights=weights, minlength=num_levels * num_labels).reshape(num_levels, num_labels)
+
+    u, v = level_labels[:, upper.row] + offsets, level_labels[:, upper.col] + offsets
+    u_in, v_in = level_labels[:, upper.row] >= 0, level_labels[:, upper.col] >= 0
+    internal = (u == v) & u_in
+    internal_edges = count(u[internal])
+    cut = count(u[(u != v) & u_in]) + count(v[(u != v) & v_in])
+    assigned = level_labels >= 0
+    degree_sum = count((level_labels + offsets)[assigned], np.broadcast_to(degrees, level_labels.shape)[assigned])
+    present = count((level_labels + offsets)[assigned]) > 0
+
+    modularity = (internal_edges / num_edges - (degree_sum / (2 * num_edges)) ** 2).sum(axis=1)
+    volume = 2 * internal_edges + cut
+    with np.errstate(invalid="ignore", divide="ignore"):
+        community_conductance = np.where(volume > 0, cut / volume, 0.0)
+    num_communities = present.sum(axis=1)
+    conductance = np.where(present, community_conductance, 0.0).sum(axis=1) / np.maximum(num_communities, 1)
+    return modularity, conductance, num_communities
 
 def compute_modularity(G, communities):
     """
     Compute modularity for a given partition (list of lists of node ids) using Newman-Girvan modularity.
     """
-    # Wrap in NodeClustering for cdlib evaluation functions
-    comm_obj = NodeClustering(communities, graph=G, method_name="custom")
-    return evaluation.newman_girvan_modularity(G, comm_obj).score
+    nodes, adjacency = graph_to_csr(nx.Graph(G) if G.is_directed() else G)
+    return float(level_scores(adjacency, partition_labels(nodes, communities))[0][0])
 
 def compute_conductance(G, communities):
     """
     Compute mean conductance for a given partition (list of lists of node ids).
     """
-    comm_obj = NodeClustering(communities, graph=G, method_name="custom")
-    return evaluation.conductance(G, comm_obj).score
+    nodes, adjacency = graph_to_csr(nx.Graph(G) if G.is_directed() else G)
+    return float(level_scores(adjacency, partition_labels(nodes, communities))[1][0])
 
 
 def compute_nmi_ari(df_with_community, level, label_col):
@@ -36,20 +86,23 @@ def print_and_store_level_evaluations(
     """
     For each level, compute and print modularity, conductance, NMI, ARI, and store in CSV.
     """
+    # Label of every node at every level, so all levels are evaluated from one scan over the edges
+    nodes, adjacency = graph_to_csr(nx.Graph(G) if G.is_directed() else G)
+    level_rows = pd.Index(levels).get_indexer(community_df['level'])
+    positions = pd.Index(nodes).get_indexer(community_df['node_id'])
+    known = (level_rows >= 0) & (positions >= 0)
+    level_labels = np.full((len(levels), len(nodes)), -1)
+    level_labels[level_rows[known], positions[known]] = pd.factorize(community_df['community_id'][known])[0]
+    level_modularity, level_conductance, level_num_communities = level_scores(adjacency, level_labels)
+
     results = []
-    for level in levels:
-        comms = []
-        for comm_id in community_df[community_df['level'] == level]['community_id'].unique():
-            nodes = community_df[(community_df['level'] == level) & (community_df['community_id'] == comm_id)]['node_id'].tolist()
-            comms.append(nodes)
-        mod = compute_modularity(G, comms)
-        cond = compute_conductance(G, comms)
+    for level, mod, cond, num_communities in zip(levels, level_modularity, level_conductance, level_num_communities):
         row = {
             "algoname_level": f"{mode}_level{level}",
-            "modularity": mod,
-            "conductance": cond
+            "modularity": float(mod),
+            "conductance": float(cond)
         }
-        print(f"Level {level}: {len(comms)} communities | Modularity: {mod:.4f} | Mean Conductance: {cond:.4f}")
+        print(f"Level {level}: {num_communities} communities | Modularity: {mod:.4f} | Mean Conductance: {cond:.4f}")
         # Compute NMI/ARI for each label
         for label in label_cols:
             nmi, ari = compute_nmi_ari(df_with_community, level, label)
@@ -1,11 +1,14 @@
-import networkx as nx
+import numpy as np
 import pandas as pd
 import os
 from graspologic.partition import hierarchical_leiden
+from array_lpa import graph_to_csr, label_propagation
 
-def hybrid_lpa_leiden_communities(G, triplet_key, max_cluster_size=100, random_state=None, output_base="../data/hybrid_lpa_leiden"):
+def hybrid_lpa_leiden_communities(G, triplet_key, max_cluster_size=100, random_state=None, output_base="../data/hybrid_lpa_leiden", lpa_mode="async", verbose=False):
     """
     Run LPA to get initial communities, then use as starting_communities for hierarchical_leiden.
+    LPA runs on an integer-indexed CSR copy of G (see array_lpa.label_propagation), seeded with
+    random_state; lpa_mode is "async" or "semi_sync". verbose prints every LPA community.
     Returns:
         community_df: DataFrame with columns ['node_id', 'community_id', 'level']
         parent_df: DataFrame with columns ['community_id', 'parent_community_id', 'level']
@@ -15,18 +18,20 @@ def hybrid_lpa_leiden_communities(G, triplet_key, max_cluster_size=100, random_s
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
 
-    # Step 1: Run LPA
-    lpa_partition = list(nx.algorithms.community.asyn_lpa_communities(G))
-    print(f"LPA found {len(lpa_partition)} initial communities.")
+    # Step 1: Run LPA on the integer-indexed adjacency
+    nodes, adjacency = graph_to_csr(G)
+    labels, num_sweeps = label_propagation(adjacency, mode=lpa_mode, seed=random_state)
+    num_lpa_communities = labels.max() + 1 if len(labels) else 0
+    print(f"LPA ({lpa_mode}) found {num_lpa_communities} initial communities in {num_sweeps} sweeps.")
 
-    for comm_id, nodes in enumerate(lpa_partition):
-        print(f"Community {comm_id}: Nodes: {list(nodes)[:5]}... (total {len(nodes)} nodes)")
+    if verbose:
+        order = np.argsort(labels, kind="stable")
+        members = np.split(order, np.flatnonzero(np.diff(labels[order])) + 1)
+        for comm_id, positions in enumerate(members):
+            print(f"Community {comm_id}: Nodes: {[nodes[i] for i in positions[:5]]}... (total {len(positions)} nodes)")
 
     # Step 2: Convert to dict[node_id] = community_id
-    starting_communities = {}
-    for comm_id, nodes in enumerate(lpa_partition):
-        for node in nodes:
-            starting_communities[node] = comm_id
+    starting_communities = dict(zip(nodes, labels.tolist()))
 
     # Step 3: Run hierarchical_leiden with starting_communities
     partitions = hierarchical_leiden(
@@ -0,0 +1,26 @@
+import networkx as nx
+import numpy as np
+import pytest
+from array_lpa import graph_to_csr, label_propagation
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_async_backends_agree(seed):
+    pytest.importorskip("numba")
+    G = nx.gnm_random_graph(500, 1500, seed=seed)
+    G.add_edge(3, 3)
+    G.add_node(1000)
+    _, adjacency = graph_to_csr(G)
+    labels_python, sweeps_python = label_propagation(adjacency, seed=seed, backend="python")
+    labels_numba, sweeps_numba = label_propagation(adjacency, seed=seed, backend="numba")
+    assert sweeps_python == sweeps_numba
+    assert np.array_equal(labels_python, labels_numba)
+
+
+def test_async_labels_are_stable():
+    # Two cliques joined by one edge end with one label per clique
+    G = nx.disjoint_union(nx.complete_graph(6), nx.complete_graph(6))
+    G.add_edge(0, 6)
+    _, adjacency = graph_to_csr(G)
+    labels, _ = label_propagation(adjacency, seed=0, backend="python")
+    assert len(set(labels[:6])) == 1 and len(set(labels[6:])) == 1
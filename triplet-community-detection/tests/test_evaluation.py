@@ -0,0 +1,18 @@
+import networkx as nx
+import pytest
+from array_lpa import graph_to_csr
+from evaluation import level_scores, partition_labels
+
+
+def test_level_scores_match_cdlib():
+    cdlib = pytest.importorskip("cdlib")
+    G = nx.relabel_nodes(nx.karate_club_graph(), lambda node: f"n{node}")
+    nx.set_edge_attributes(G, 1, "weight")
+    communities = [list(c) for c in nx.community.greedy_modularity_communities(G)]
+    clustering = cdlib.NodeClustering(communities, G, overlap=False)
+
+    nodes, adjacency = graph_to_csr(G)
+    modularity, conductance, num_communities = level_scores(adjacency, partition_labels(nodes, communities))
+    assert modularity[0] == pytest.approx(cdlib.evaluation.newman_girvan_modularity(G, clustering).score)
+    assert conductance[0] == pytest.approx(cdlib.evaluation.conductance(G, clustering).score)
+    assert num_communities[0] == len(communities)